@@ -1,13 +1,16 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import schemas
 from .models.base import User
-from .database import get_db
+from .database import get_async_db
+from .utils.cache import CacheTTL
 import os
 from dotenv import load_dotenv
 
@@ -17,10 +20,43 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Segundos que un usuario autenticado se reutiliza sin volver a consultar la base.
+# Cada worker tiene su caché: un usuario eliminado o modificado por otro worker,
+# por un UPDATE/DELETE masivo o por SQL directo se sigue aceptando hasta este TTL
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "10"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    """
+    Datos del usuario autenticado que usan las rutas (id, correo y nombre).
+    Es lo que se guarda en caché, en lugar de la instancia ORM ligada a una sesión.
+    """
+    id: int
+    email: str
+    nombre: Optional[str]
+
+# Usuarios resueltos por 'sub' (el correo) del token
+_usuarios_cache = CacheTTL("auth_usuarios", AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES)
+
+def invalidar_usuario(email: str) -> None:
+    """
+    Descarta el usuario en caché de este worker. Se llama automáticamente al
+    modificar o eliminar un User con el ORM; el resto de los casos los cubre el TTL.
+    """
+    _usuarios_cache.invalidar(email)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidar_al_modificar(mapper, connection, target):
+    historial = inspect(target).attrs.email.history
+    for email in (target.email, *historial.deleted):
+        if email:
+            invalidar_usuario(email)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -37,7 +73,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,8 +87,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
+
+    user = _usuarios_cache.obtener(token_data.email)
+    if user is not None:
+        return user
+
+    # El usuario se confirma siempre en la base: un token válido de un usuario
+    # eliminado no autentica más allá del TTL de la caché
+    db_user = (await db.execute(select(User).where(User.email == token_data.email))).scalars().first()
+    if db_user is None:
         raise credentials_exception
-    return user 
\ No newline at end of file
+    user = UsuarioAutenticado(id=db_user.id, email=db_user.email, nombre=db_user.nombre)
+    _usuarios_cache.guardar(token_data.email, user)
+    return user
@@ -0,0 +1,402 @@
+import os
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import JSON, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models_auto import (
+    PerfilUsuario,
+    HistorialMedico,
+    PreferenciasAlimentarias,
+    AlimentosEvitados,
+    CondicionFisica,
+    MetaUsuario,
+    HabitosDiarios,
+    EjercicioPreferido,
+    EquipamientoDisponible,
+)
+from app.crud.metricas_salud import actualizar_metricas_salud
+from app.crud.perfil_usuario import calcular_encuesta_completa
+from app.schemas.survey import (
+    SurveyDataResponse,
+    FoodPreferences,
+    PhysicalCondition,
+    MedicalHistory,
+    DailyHabits,
+)
+from app.utils.cache import CacheTTL
+from app.utils.lotes import en_lotes
+
+load_dotenv()
+
+# Cada worker tiene su propia caché: tras guardar la encuesta, los demás workers
+# pueden servir los datos anteriores hasta que venza este TTL
+ENCUESTA_CACHE_TTL_SECONDS = float(os.getenv("ENCUESTA_CACHE_TTL_SECONDS", "5"))
+ENCUESTA_CACHE_MAX_ENTRIES = int(os.getenv("ENCUESTA_CACHE_MAX_ENTRIES", "10000"))
+
+# Datos de /api/survey-data por id de usuario, con hasta ENCUESTA_CACHE_TTL_SECONDS de retraso
+_encuesta_cache = CacheTTL("encuesta", ENCUESTA_CACHE_TTL_SECONDS, ENCUESTA_CACHE_MAX_ENTRIES)
+
+COLUMNAS_PERFIL = [
+    "id", "id_usuario", "genero", "edad", "altura", "peso", "nivel_actividad",
+    "objetivo_principal", "tiempo_meta", "nivel_compromiso", "medicion_progreso",
+]
+
+# Sección de la respuesta -> (modelo, columnas, una sola fila ('columnas') o varias ('registros'))
+SECCIONES_DATOS = {
+    "historial_medico": (
+        HistorialMedico,
+        ["id", "id_perfil", "condicion_cronica", "medicamentos", "lesiones",
+         "antecedentes_familiares", "otras_condiciones"],
+        "columnas",
+    ),
+    "preferencias_alimentarias": (
+        PreferenciasAlimentarias,
+        ["id", "id_perfil", "tipo", "valor", "otros_alergias", "otros_alimentos_favoritos"],
+        "registros",
+    ),
+    "metas_objetivos": (
+        MetaUsuario,
+        ["id", "id_usuario", "id_tipo_objetivo"],
+        "columnas",
+    ),
+    "habitos_diarios": (
+        HabitosDiarios,
+        ["id", "id_perfil", "horas_sueno", "calidad_sueno", "nivel_estres", "agua_dia",
+         "comidas_dia", "habitos_snack", "horas_pantalla", "tipo_trabajo"],
+        "columnas",
+    ),
+    "ejercicios_preferidos": (
+        EjercicioPreferido,
+        ["id", "id_perfil", "tipo"],
+        "registros",
+    ),
+    "equipamiento_disponible": (
+        EquipamientoDisponible,
+        ["id", "id_perfil", "equipo"],
+        "registros",
+    ),
+}
+
+def _filas_json(modelo, columnas: List[str]):
+    """
+    Subconsulta correlacionada con las filas de la sección como arreglo JSON
+    (NULL si no hay filas). Metas se relaciona por usuario, el resto por perfil.
+    """
+    clave = (
+        modelo.id_usuario == PerfilUsuario.id_usuario
+        if modelo is MetaUsuario
+        else modelo.id_perfil == PerfilUsuario.id
+    )
+    pares = [valor for columna in columnas for valor in (columna, getattr(modelo, columna))]
+    return (
+        select(func.json_arrayagg(func.json_object(*pares), type_=JSON))
+        .where(clave)
+        .scalar_subquery()
+    )
+
+def datos_encuesta_stmt(id_usuario: int):
+    """
+    Consulta única con el perfil y cada sección agregada con JSON_ARRAYAGG.
+    """
+    return select(
+        *[getattr(PerfilUsuario, columna) for columna in COLUMNAS_PERFIL],
+        *[
+            _filas_json(modelo, columnas).label(seccion)
+            for seccion, (modelo, columnas, _) in SECCIONES_DATOS.items()
+        ]
+    ).where(PerfilUsuario.id_usuario == id_usuario).limit(1)
+
+def armar_datos_encuesta(fila) -> Dict[str, Any]:
+    """
+    Estructura de tablas y columnas que devuelve GET /api/survey-data.
+    Las secciones de una sola fila toman la de menor id.
+    """
+    datos = {
+        "perfil_usuario": {
+            "tabla": "perfil_usuario",
+            "columnas": {columna: getattr(fila, columna) for columna in COLUMNAS_PERFIL}
+        }
+    }
+    for seccion, (modelo, columnas, forma) in SECCIONES_DATOS.items():
+        registros = sorted(getattr(fila, seccion) or [], key=lambda registro: registro["id"])
+        if forma == "columnas":
+            primero = registros[0] if registros else {}
+            contenido = {columna: primero.get(columna) for columna in columnas}
+        else:
+            contenido = [{columna: registro.get(columna) for columna in columnas} for registro in registros]
+        datos[seccion] = {"tabla": modelo.__tablename__.lower(), forma: contenido}
+    return datos
+
+def obtener_datos_encuesta(db: Session, id_usuario: int) -> Optional[Dict[str, Any]]:
+    """
+    Datos de la encuesta del usuario, o None si no tiene perfil.
+    Se sirven desde la caché del proceso; al faltar se cargan con una sola consulta.
+    Pueden tener hasta ENCUESTA_CACHE_TTL_SECONDS de antigüedad respecto de la
+    base. El resultado es compartido: no se debe modificar.
+    """
+    datos = _encuesta_cache.obtener(id_usuario)
+    if datos is None:
+        fila = db.execute(datos_encuesta_stmt(id_usuario)).first()
+        if fila is None:
+            return None
+        datos = armar_datos_encuesta(fila)
+        _encuesta_cache.guardar(id_usuario, datos)
+    return datos
+
+def invalidar_datos_encuesta(id_usuario: int) -> None:
+    """
+    Descarta la copia de este worker, para que quien guarda la encuesta la lea
+    actualizada. No alcanza a los demás workers: ahí rige el TTL.
+    """
+    _encuesta_cache.invalidar(id_usuario)
+
+# Tablas que escribe POST /api/survey/complete -> columnas que vienen de la encuesta
+COLUMNAS_ESCRITURA = {
+    PreferenciasAlimentarias: ["tipo", "valor", "otros_alergias", "otros_alimentos_favoritos"],
+    AlimentosEvitados: ["descripcion"],
+    CondicionFisica: ["frecuencia_ejercicio", "tiempo_disponible"],
+    EjercicioPreferido: ["tipo"],
+    EquipamientoDisponible: ["equipo"],
+    HistorialMedico: ["condicion_cronica", "otras_condiciones", "medicamentos", "lesiones", "antecedentes_familiares"],
+    HabitosDiarios: ["horas_sueno", "calidad_sueno", "nivel_estres", "agua_dia", "comidas_dia",
+                     "habitos_snack", "horas_pantalla", "tipo_trabajo"],
+}
+
+# Tablas con una sola fila por perfil: se actualizan en lugar de reemplazarse
+TABLAS_UNA_FILA = (CondicionFisica, HistorialMedico, HabitosDiarios)
+
+def filas_preferencias_alimentarias(comida: FoodPreferences) -> Dict[Any, List[Dict[str, Any]]]:
+    return {
+        PreferenciasAlimentarias: (
+            [{"tipo": "dieta", "valor": tipo, "otros_alergias": None, "otros_alimentos_favoritos": None}
+             for tipo in comida.tipoDieta]
+            + [{"tipo": "alergia", "valor": alergia,
+                "otros_alergias": comida.otrosAlergias if alergia == 'Otro' else None,
+                "otros_alimentos_favoritos": None}
+               for alergia in comida.alergias]
+            + [{"tipo": "favorito", "valor": favorito, "otros_alergias": None,
+                "otros_alimentos_favoritos": comida.otrosAlimentosFavoritos if favorito == 'Otros' else None}
+               for favorito in comida.alimentosFavoritos]
+        ),
+        AlimentosEvitados: [{"descripcion": alimento} for alimento in comida.alimentosEvitados],
+    }
+
+def filas_condicion_fisica(fisica: PhysicalCondition) -> Dict[Any, List[Dict[str, Any]]]:
+    return {
+        CondicionFisica: [{
+            "frecuencia_ejercicio": fisica.frecuenciaEjercicio,
+            "tiempo_disponible": fisica.tiempoDisponible,
+        }],
+        EjercicioPreferido: [{"tipo": ejercicio} for ejercicio in fisica.ejerciciosPreferidos],
+        EquipamientoDisponible: [{"equipo": equipo} for equipo in fisica.equipamientoDisponible],
+    }
+
+def filas_historial_medico(medico: MedicalHistory) -> Dict[Any, List[Dict[str, Any]]]:
+    return {
+        HistorialMedico: [{
+            "condicion_cronica": medico.condicionCronica,
+            "otras_condiciones": medico.otrasCondiciones,
+            "medicamentos": medico.medicamentos,
+            "lesiones": medico.lesiones,
+            "antecedentes_familiares": medico.antecedentesFamiliares,
+        }],
+    }
+
+def filas_habitos_diarios(habitos: DailyHabits) -> Dict[Any, List[Dict[str, Any]]]:
+    return {
+        HabitosDiarios: [{
+            "horas_sueno": habitos.horasSueno,
+            "calidad_sueno": habitos.calidadSueno,
+            "nivel_estres": habitos.nivelEstres,
+            "agua_dia": habitos.aguaDia,
+            "comidas_dia": habitos.comidasDia,
+            "habitos_snack": habitos.habitosSnack,
+            "horas_pantalla": habitos.horasPantalla,
+            "tipo_trabajo": habitos.tipoTrabajo,
+        }],
+    }
+
+# Sección de SurveyDataResponse -> filas de sus tablas
+FILAS_POR_SECCION = {
+    "foodPreferences": filas_preferencias_alimentarias,
+    "physicalCondition": filas_condicion_fisica,
+    "medicalHistory": filas_historial_medico,
+    "dailyHabits": filas_habitos_diarios,
+}
+
+# Columnas de Perfil_Usuario que vienen de personalInfo
+COLUMNAS_INFO_PERSONAL = {
+    "genero": "genero",
+    "edad": "edad",
+    "peso": "peso",
+    "altura": "altura",
+    "nivel_actividad": "nivelActividad",
+}
+
+def _valor_distinto(actual, nuevo) -> bool:
+    # peso y altura son DECIMAL en la base y float en el esquema
+    if isinstance(actual, Decimal) and isinstance(nuevo, float):
+        return actual != Decimal(str(nuevo))
+    return actual != nuevo
+
+def filas_encuesta(survey_data: SurveyDataResponse) -> Dict[Any, List[Dict[str, Any]]]:
+    """
+    Filas (sin id ni id_perfil) que debe tener cada tabla según la encuesta enviada.
+    """
+    filas = {}
+    for seccion, armar_filas in FILAS_POR_SECCION.items():
+        filas.update(armar_filas(getattr(survey_data, seccion)))
+    return filas
+
+def leer_filas_encuesta(db: Session, id_perfil: int, modelos) -> Dict[Any, List[Dict[str, Any]]]:
+    """
+    Filas guardadas del perfil (id y columnas de COLUMNAS_ESCRITURA) de cada
+    modelo, ordenadas por id, leídas con una sola consulta.
+    """
+    fila = db.execute(
+        select(*[
+            _filas_json(modelo, ["id", *COLUMNAS_ESCRITURA[modelo]]).label(modelo.__tablename__)
+            for modelo in modelos
+        ]).where(PerfilUsuario.id == id_perfil)
+    ).one()
+    return {
+        modelo: sorted(getattr(fila, modelo.__tablename__) or [], key=lambda registro: registro["id"])
+        for modelo in modelos
+    }
+
+def diferencia_filas(
+    actuales: List[Dict[str, Any]],
+    deseadas: List[Dict[str, Any]],
+    columnas: List[str]
+) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """
+    Compara las filas como multiconjuntos de valores: las guardadas que siguen
+    en la encuesta se conservan (aunque cambie el orden), las sobrantes se
+    borran y las que faltan se insertan.
+
+    Retorna (ids a borrar, filas a insertar en el orden enviado).
+    """
+    faltantes = Counter(tuple(fila[c] for c in columnas) for fila in deseadas)
+    borrar = []
+    for fila in actuales:
+        clave = tuple(fila.get(c) for c in columnas)
+        if faltantes[clave] > 0:
+            faltantes[clave] -= 1
+        else:
+            borrar.append(fila["id"])
+
+    insertar = []
+    for fila in deseadas:
+        clave = tuple(fila[c] for c in columnas)
+        if faltantes[clave] > 0:
+            faltantes[clave] -= 1
+            insertar.append(fila)
+    return borrar, insertar
+
+def guardar_filas(db: Session, id_perfil: int, deseadas: Dict[Any, List[Dict[str, Any]]]) -> Dict[str, Dict[str, int]]:
+    """
+    Lleva las tablas de `deseadas` al estado indicado escribiendo solo lo que
+    cambió: un DELETE por ids e INSERTs multi-fila en las tablas con varias
+    filas, y un UPDATE de las columnas modificadas en las tablas de una sola
+    fila (CondicionFisica, HistorialMedico, HabitosDiarios).
+    No hace commit.
+
+    Retorna, por tabla modificada, la cantidad de filas borradas, insertadas y
+    actualizadas.
+    """
+    actuales = leer_filas_encuesta(db, id_perfil, list(deseadas))
+    cambios = {}
+    for modelo, filas in deseadas.items():
+        columnas = COLUMNAS_ESCRITURA[modelo]
+        guardadas = actuales[modelo]
+        actualizadas = 0
+        if modelo in TABLAS_UNA_FILA and guardadas:
+            # Se conserva la fila de menor id; las repetidas de versiones anteriores se borran
+            primera, borrar, insertar = guardadas[0], [fila["id"] for fila in guardadas[1:]], []
+            valores = {c: v for c, v in filas[0].items() if primera.get(c) != v}
+            if valores:
+                db.execute(
+                    update(modelo)
+                    .execution_options(synchronize_session=False)
+                    .where(modelo.id == primera["id"])
+                    .values(valores)
+                )
+                actualizadas = 1
+        else:
+            borrar, insertar = diferencia_filas(guardadas, filas, columnas)
+
+        if borrar:
+            db.execute(
+                delete(modelo)
+                .execution_options(synchronize_session=False)
+                .where(modelo.id.in_(borrar))
+            )
+        for lote in en_lotes(insertar):
+            db.execute(insert(modelo).values([{"id_perfil": id_perfil, **fila} for fila in lote]))
+
+        if borrar or insertar or actualizadas:
+            cambios[modelo.__tablename__] = {
+                "borradas": len(borrar),
+                "insertadas": len(insertar),
+                "actualizadas": actualizadas,
+            }
+    return cambios
+
+def guardar_filas_encuesta(db: Session, id_perfil: int, survey_data: SurveyDataResponse) -> Dict[str, Dict[str, int]]:
+    """
+    Guarda todas las secciones de la encuesta con guardar_filas. No hace commit.
+    """
+    return guardar_filas(db, id_perfil, filas_encuesta(survey_data))
+
+def actualizar_seccion_encuesta(db: Session, id_usuario: int, seccion: str, datos) -> Optional[Dict[str, Dict[str, int]]]:
+    """
+    Guarda una sola sección de la encuesta ('personalInfo' o una de
+    FILAS_POR_SECCION) tocando solo sus tablas, recalcula encuesta_completa
+    si hubo cambios (y las métricas de salud si cambió personalInfo) y hace commit.
+
+    Retorna None si el usuario no tiene perfil y, si lo tiene, los cambios por tabla.
+    """
+    perfil = db.execute(
+        select(PerfilUsuario.id, PerfilUsuario.encuesta_completa, *[
+            getattr(PerfilUsuario, columna) for columna in COLUMNAS_INFO_PERSONAL
+        ])
+        .where(PerfilUsuario.id_usuario == id_usuario)
+        .limit(1)
+    ).first()
+    if perfil is None:
+        return None
+
+    if seccion == "personalInfo":
+        valores = {
+            columna: getattr(datos, campo)
+            for columna, campo in COLUMNAS_INFO_PERSONAL.items()
+            if _valor_distinto(getattr(perfil, columna), getattr(datos, campo))
+        }
+        cambios = {}
+        if valores:
+            db.execute(
+                update(PerfilUsuario)
+                .execution_options(synchronize_session=False)
+                .where(PerfilUsuario.id == perfil.id)
+                .values(valores)
+            )
+            cambios[PerfilUsuario.__tablename__] = {"borradas": 0, "insertadas": 0, "actualizadas": 1}
+            actualizar_metricas_salud(db, id_usuario)
+    else:
+        cambios = guardar_filas(db, perfil.id, FILAS_POR_SECCION[seccion](datos))
+
+    if cambios:
+        completa = calcular_encuesta_completa(db, id_usuario)
+        if perfil.encuesta_completa is None or bool(perfil.encuesta_completa) != completa:
+            db.execute(
+                update(PerfilUsuario)
+                .execution_options(synchronize_session=False)
+                .where(PerfilUsuario.id == perfil.id)
+                .values(encuesta_completa=completa)
+            )
+    db.commit()
+    return cambios
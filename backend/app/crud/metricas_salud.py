@@ -0,0 +1,234 @@
+import hashlib
+from datetime import datetime
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models_auto import MetricasSaludPerfil, PerfilUsuario, SeguimientoMetrica
+from app.utils.health_calculations import calculate_all_metrics
+from app.utils.health_calculations_lote import CATEGORIAS_IMC, calcular_metricas_lote
+from app.utils.lotes import en_lotes
+
+# Las mediciones de este tipo reemplazan al peso de la encuesta como peso actual
+TIPO_METRICA_PESO = 'Peso corporal'
+
+COLUMNAS_METRICAS = [
+    "peso_actual", "tmb", "peso_ideal", "frecuencia_cardiaca_maxima",
+    "imc", "categoria_imc", "diferencia_peso",
+]
+
+def _entradas_metricas():
+    """
+    Datos del perfil que usan las métricas y el último 'Peso corporal'
+    registrado (por el índice usuario, tipo, fecha).
+    """
+    peso_registrado = (
+        select(SeguimientoMetrica.valor_principal)
+        .where(SeguimientoMetrica.id_usuario == PerfilUsuario.id_usuario)
+        .where(SeguimientoMetrica.tipo_metrica == TIPO_METRICA_PESO)
+        .order_by(SeguimientoMetrica.fecha.desc(), SeguimientoMetrica.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return select(
+        PerfilUsuario.id,
+        PerfilUsuario.id_usuario,
+        PerfilUsuario.edad,
+        PerfilUsuario.genero,
+        PerfilUsuario.peso,
+        PerfilUsuario.altura,
+        peso_registrado.label("peso_registrado"),
+    )
+
+def entradas_metricas_stmt(id_usuario: int):
+    return _entradas_metricas().where(PerfilUsuario.id_usuario == id_usuario).limit(1)
+
+def entradas_metricas_bloque_stmt(despues_de_id: int, limite: int):
+    """
+    Siguiente bloque de perfiles por id (keyset), para recorrer todos los
+    perfiles sin OFFSET.
+    """
+    return (
+        _entradas_metricas()
+        .where(PerfilUsuario.id > despues_de_id)
+        .order_by(PerfilUsuario.id)
+        .limit(limite)
+    )
+
+def respuesta_metricas(fila) -> Dict[str, Any]:
+    """
+    Cuerpo de GET /api/usuarios/me/health-metrics a partir de una fila de
+    Metricas_Salud_Perfil (o del dict que se va a guardar).
+    """
+    return {
+        "tmb": float(fila["tmb"]),
+        "peso_ideal": float(fila["peso_ideal"]),
+        "frecuencia_cardiaca_maxima": fila["frecuencia_cardiaca_maxima"],
+        "peso_actual": float(fila["peso_actual"]),
+        "diferencia_peso": float(fila["diferencia_peso"]),
+        "imc": {
+            "valor": float(fila["imc"]),
+            "categoria": fila["categoria_imc"]
+        }
+    }
+
+def etag_metricas(fila) -> str:
+    """
+    ETag de la respuesta, calculado al leer a partir de las columnas guardadas.
+    """
+    return hashlib.sha1(orjson.dumps(respuesta_metricas(fila), option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def armar_metricas(entrada) -> Optional[Dict[str, Any]]:
+    """
+    Fila de Metricas_Salud_Perfil para una fila de entradas_metricas_stmt, o
+    None si faltan datos del perfil para calcularlas.
+    """
+    peso = entrada.peso_registrado if entrada.peso_registrado is not None else entrada.peso
+    if not all([entrada.edad, entrada.genero, peso, entrada.altura]):
+        return None
+
+    metricas = calculate_all_metrics(
+        edad=entrada.edad,
+        genero=entrada.genero,
+        peso=peso,
+        altura=entrada.altura
+    )
+    return {
+        "id_usuario": entrada.id_usuario,
+        "id_perfil": entrada.id,
+        "peso_actual": float(peso),
+        "tmb": metricas["tmb"],
+        "peso_ideal": metricas["peso_ideal"],
+        "frecuencia_cardiaca_maxima": metricas["frecuencia_cardiaca_maxima"],
+        "imc": metricas["imc"]["valor"],
+        "categoria_imc": metricas["imc"]["categoria"],
+        "diferencia_peso": round(float(peso) - metricas["peso_ideal"], 2),
+        "calculado_en": datetime.now().replace(microsecond=0),
+    }
+
+def _fila_metricas(id_usuario, id_perfil, peso_actual, tmb, peso_ideal, frecuencia_cardiaca_maxima,
+                   imc, categoria_imc, diferencia_peso, calculado_en) -> Dict[str, Any]:
+    return {
+        "id_usuario": id_usuario,
+        "id_perfil": id_perfil,
+        "peso_actual": peso_actual,
+        "tmb": tmb,
+        "peso_ideal": peso_ideal,
+        "frecuencia_cardiaca_maxima": frecuencia_cardiaca_maxima,
+        "imc": imc,
+        "categoria_imc": categoria_imc,
+        "diferencia_peso": diferencia_peso,
+        "calculado_en": calculado_en,
+    }
+
+def _columna_float(valores: List) -> np.ndarray:
+    # Más rápido que np.array sobre los Decimal que devuelve MySQL
+    return np.fromiter(map(float, valores), dtype=np.float64, count=len(valores))
+
+def armar_metricas_lote(entradas: Sequence) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Equivalente de armar_metricas para muchas filas de entradas_metricas_bloque_stmt,
+    con las fórmulas vectorizadas de health_calculations_lote. Las filas se arman
+    directamente desde las columnas resultantes (_fila_metricas sobre cada una).
+
+    Retorna (filas de Metricas_Salud_Perfil, ids de usuario sin datos suficientes).
+    """
+    if not entradas:
+        return [], []
+    ids_perfil, ids_usuario, edades, generos, pesos_encuesta, alturas, pesos_registrados = zip(*entradas)
+    pesos = [
+        registrado if registrado is not None else peso
+        for registrado, peso in zip(pesos_registrados, pesos_encuesta)
+    ]
+    validas = [all(datos) for datos in zip(edades, generos, pesos, alturas)]
+    sin_datos = [id_usuario for id_usuario, valida in zip(ids_usuario, validas) if not valida]
+    if sin_datos:
+        completas = [i for i, valida in enumerate(validas) if valida]
+        if not completas:
+            return [], sin_datos
+        ids_perfil, ids_usuario, edades, generos, pesos, alturas = (
+            [columna[i] for i in completas]
+            for columna in (ids_perfil, ids_usuario, edades, generos, pesos, alturas)
+        )
+
+    peso = _columna_float(pesos)
+    metricas = calcular_metricas_lote(
+        edad=_columna_float(edades),
+        genero=np.array([genero.lower() == 'masculino' for genero in generos], dtype=np.bool_),
+        peso=peso,
+        altura=_columna_float(alturas)
+    )
+
+    filas = list(map(
+        _fila_metricas,
+        ids_usuario,
+        ids_perfil,
+        peso.tolist(),
+        metricas["tmb"].tolist(),
+        metricas["peso_ideal"].tolist(),
+        metricas["frecuencia_cardiaca_maxima"].tolist(),
+        metricas["imc"].tolist(),
+        np.array(CATEGORIAS_IMC, dtype=object)[metricas["codigo_imc"]].tolist(),
+        metricas["diferencia_peso"].tolist(),
+        repeat(datetime.now().replace(microsecond=0)),
+    ))
+    return filas, sin_datos
+
+def guardar_metricas_stmt(filas):
+    stmt = insert(MetricasSaludPerfil).values(filas)
+    return stmt.on_duplicate_key_update(
+        {columna: stmt.inserted[columna] for columna in ["id_perfil", *COLUMNAS_METRICAS, "calculado_en"]}
+    )
+
+def actualizar_metricas_salud(db: Session, id_usuario: int) -> Optional[Dict[str, Any]]:
+    """
+    Recalcula y guarda las métricas de salud del usuario. Se llama al cambiar
+    los datos de la encuesta o los registros de 'Peso corporal', dentro de la
+    transacción de ese cambio (no hace commit). Si el perfil ya no tiene los
+    datos necesarios se borran las métricas guardadas.
+    """
+    entrada = db.execute(entradas_metricas_stmt(id_usuario)).first()
+    fila = armar_metricas(entrada) if entrada is not None else None
+    if fila is not None:
+        db.execute(guardar_metricas_stmt([fila]))
+    else:
+        db.execute(delete(MetricasSaludPerfil).where(MetricasSaludPerfil.id_usuario == id_usuario))
+    return fila
+
+def guardar_metricas_lote(db: Session, filas: Sequence[Dict[str, Any]], sin_datos: Sequence[int] = ()) -> None:
+    """
+    Guarda las métricas con INSERT ... ON DUPLICATE KEY UPDATE multi-fila y
+    borra las de los usuarios sin datos suficientes. No hace commit.
+    """
+    for lote in en_lotes(filas):
+        db.execute(guardar_metricas_stmt(lote))
+    for lote in en_lotes(sin_datos):
+        db.execute(delete(MetricasSaludPerfil).where(MetricasSaludPerfil.id_usuario.in_(lote)))
+
+async def obtener_metricas_salud_async(db: AsyncSession, id_usuario: int) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Métricas de salud guardadas del usuario. Si aún no se calcularon (perfiles
+    anteriores a la tabla) se calculan y se guardan en esta lectura.
+
+    Retorna (tiene perfil, métricas o None si faltan datos para calcularlas).
+    """
+    guardadas = (await db.execute(
+        select(MetricasSaludPerfil.__table__).where(MetricasSaludPerfil.id_usuario == id_usuario)
+    )).mappings().first()
+    if guardadas is not None:
+        return True, dict(guardadas)
+
+    entrada = (await db.execute(entradas_metricas_stmt(id_usuario))).first()
+    if entrada is None:
+        return False, None
+    fila = armar_metricas(entrada)
+    if fila is not None:
+        await db.execute(guardar_metricas_stmt([fila]))
+        await db.commit()
+    return True, fila
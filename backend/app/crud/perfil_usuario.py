@@ -1,7 +1,25 @@
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.models_auto import PerfilUsuario
+from app.models.models_auto import (
+    PerfilUsuario,
+    PreferenciasAlimentarias,
+    CondicionFisica,
+    HabitosDiarios,
+    EjercicioPreferido,
+    EquipamientoDisponible,
+)
 from app.schemas.perfil_usuario import PerfilUsuarioCreate
 
+# Secciones de la encuesta que deben tener al menos una fila para darla por completa
+SECCIONES_ENCUESTA = {
+    "food_preferences": PreferenciasAlimentarias,
+    "fitness": CondicionFisica,
+    "habits": HabitosDiarios,
+    "exercises": EjercicioPreferido,
+    "equipment": EquipamientoDisponible,
+}
+
 def crear_perfil(db: Session, datos: PerfilUsuarioCreate):
     perfil = PerfilUsuario(**datos.dict())
     db.add(perfil)
@@ -17,6 +35,80 @@ def actualizar_perfil(db: Session, id_perfil: int, datos: PerfilUsuarioCreate):
     if perfil:
         for key, value in datos.dict().items():
             setattr(perfil, key, value)
+        # Los datos básicos cambiaron: el estado de la encuesta se recalcula en la próxima lectura
+        perfil.encuesta_completa = None
         db.commit()
         db.refresh(perfil)
-    return perfil
\ No newline at end of file
+    return perfil
+
+def tiene_info_basica(perfil) -> bool:
+    """
+    Verifica los datos básicos del perfil que exige la encuesta.
+    Acepta una instancia de PerfilUsuario o una fila con las mismas columnas.
+    """
+    return all([
+        perfil.genero is not None and perfil.genero != '',
+        perfil.edad is not None and perfil.edad > 0,
+        perfil.peso is not None and perfil.peso > 0,
+        perfil.altura is not None and perfil.altura > 0,
+        perfil.nivel_actividad is not None and perfil.nivel_actividad != '',
+        perfil.objetivo_principal is not None and perfil.objetivo_principal != '',
+        perfil.tiempo_meta is not None and perfil.tiempo_meta != '',
+        perfil.nivel_compromiso is not None and perfil.nivel_compromiso > 0
+    ])
+
+def estado_encuesta_stmt(id_usuario: int):
+    """
+    Consulta única con los datos básicos del perfil y un EXISTS por cada sección
+    de la encuesta.
+    """
+    return select(
+        PerfilUsuario.id,
+        PerfilUsuario.genero,
+        PerfilUsuario.edad,
+        PerfilUsuario.peso,
+        PerfilUsuario.altura,
+        PerfilUsuario.nivel_actividad,
+        PerfilUsuario.objetivo_principal,
+        PerfilUsuario.tiempo_meta,
+        PerfilUsuario.nivel_compromiso,
+        *[
+            exists().where(modelo.id_perfil == PerfilUsuario.id).label(seccion)
+            for seccion, modelo in SECCIONES_ENCUESTA.items()
+        ]
+    ).where(PerfilUsuario.id_usuario == id_usuario).limit(1)
+
+def _evaluar_estado(estado) -> bool:
+    return tiene_info_basica(estado) and all(bool(getattr(estado, seccion)) for seccion in SECCIONES_ENCUESTA)
+
+def calcular_encuesta_completa(db: Session, id_usuario: int) -> bool:
+    """
+    Calcula el estado de la encuesta con una sola consulta. Requiere que los
+    cambios pendientes de la sesión ya estén en flush.
+    """
+    estado = db.execute(estado_encuesta_stmt(id_usuario)).first()
+    return estado is not None and _evaluar_estado(estado)
+
+async def obtener_encuesta_completa(db: AsyncSession, id_usuario: int):
+    """
+    Retorna None si el usuario no tiene perfil y, si lo tiene, si completó la encuesta.
+    Lee el flag encuesta_completa (búsqueda por índice en id_usuario); si aún no
+    está calculado lo obtiene con estado_encuesta_stmt y lo guarda.
+    """
+    fila = (await db.execute(
+        select(PerfilUsuario.id, PerfilUsuario.encuesta_completa)
+        .where(PerfilUsuario.id_usuario == id_usuario)
+        .limit(1)
+    )).first()
+    if fila is None:
+        return None
+    if fila.encuesta_completa is not None:
+        return bool(fila.encuesta_completa)
+
+    estado = (await db.execute(estado_encuesta_stmt(id_usuario))).first()
+    completa = _evaluar_estado(estado)
+    await db.execute(
+        update(PerfilUsuario).where(PerfilUsuario.id == fila.id).values(encuesta_completa=completa)
+    )
+    await db.commit()
+    return completa
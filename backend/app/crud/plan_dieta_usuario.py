@@ -1,6 +1,10 @@
+from typing import List
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.models_auto import PlanDietaUsuario
+from app.models.models_auto import PlanDietaUsuario, PlanComidasDiario, DetallePlanComidas
 from app.schemas.plan_dieta_usuario import PlanDietaCreate
+from app.utils.lotes import en_lotes
 
 def crear_plan_dieta(db: Session, datos: PlanDietaCreate):
     nuevo = PlanDietaUsuario(**datos.dict())
@@ -20,3 +24,138 @@ def actualizar_plan(db: Session, id: int, datos: PlanDietaCreate):
         db.commit()
         db.refresh(plan)
     return plan
+
+def plan_comidas_completo_stmt(id_usuario: int):
+    """
+    Construye la consulta que trae el plan de comidas más reciente del usuario
+    junto con sus días y comidas en un solo SELECT (plan -> días -> detalles).
+    """
+    ultimo_plan = (
+        select(func.max(PlanDietaUsuario.id))
+        .where(PlanDietaUsuario.id_usuario == id_usuario)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            PlanDietaUsuario.id.label("id_plan"),
+            PlanComidasDiario.id.label("id_dia"),
+            PlanComidasDiario.fecha,
+            DetallePlanComidas.id.label("id_detalle"),
+            DetallePlanComidas.tipo_comida,
+            DetallePlanComidas.plato,
+            DetallePlanComidas.proteinas,
+            DetallePlanComidas.grasas,
+            DetallePlanComidas.carbohidratos,
+            DetallePlanComidas.calorias
+        )
+        .select_from(PlanDietaUsuario)
+        .outerjoin(PlanComidasDiario, PlanComidasDiario.id_plan_dieta == PlanDietaUsuario.id)
+        .outerjoin(DetallePlanComidas, DetallePlanComidas.id_plan_diario == PlanComidasDiario.id)
+        .where(PlanDietaUsuario.id == ultimo_plan)
+        .order_by(PlanComidasDiario.fecha, PlanComidasDiario.id, DetallePlanComidas.id)
+    )
+
+def armar_plan_comidas(rows):
+    """
+    Agrupa las filas planas de plan_comidas_completo_stmt en la estructura
+    que devuelve GET /api/meal-plan. Retorna None si no hay plan.
+    """
+    if not rows:
+        return None
+
+    plan_completo = []
+    dia_actual = None
+    id_dia_actual = None
+    for row in rows:
+        if row.id_dia is None:
+            continue
+        if row.id_dia != id_dia_actual:
+            id_dia_actual = row.id_dia
+            dia_actual = {
+                "fecha": row.fecha.isoformat(),
+                "comidas": []
+            }
+            plan_completo.append(dia_actual)
+        if row.id_detalle is not None:
+            dia_actual["comidas"].append({
+                "tipo_comida": row.tipo_comida,
+                "plato": row.plato,
+                "proteinas": row.proteinas,
+                "grasas": row.grasas,
+                "carbohidratos": row.carbohidratos,
+                "calorias": row.calorias
+            })
+    return plan_completo
+
+def obtener_plan_comidas_completo(db: Session, id_usuario: int):
+    """
+    Obtiene el plan de comidas más reciente del usuario con todos sus días y
+    comidas usando una única consulta a la base de datos.
+    """
+    rows = db.execute(plan_comidas_completo_stmt(id_usuario)).all()
+    return armar_plan_comidas(rows)
+
+async def obtener_plan_comidas_completo_async(db: AsyncSession, id_usuario: int):
+    """
+    Igual que obtener_plan_comidas_completo, para rutas que usan AsyncSession.
+    """
+    rows = (await db.execute(plan_comidas_completo_stmt(id_usuario))).all()
+    return armar_plan_comidas(rows)
+
+def insertar_dias_plan_comidas(db: Session, id_plan_dieta: int, dias) -> List[int]:
+    """
+    Inserta días de un plan de comidas y sus comidas con INSERT multi-fila.
+    Los ids de los días se resuelven con un único SELECT: dentro de un mismo
+    INSERT los autoincrementales son crecientes en el orden de VALUES.
+    No hace commit. Retorna los ids de los días en el orden recibido.
+    """
+    if not dias:
+        return []
+
+    for lote in en_lotes(dias):
+        db.execute(insert(PlanComidasDiario).values([
+            {"id_plan_dieta": id_plan_dieta, "fecha": dia['fecha']}
+            for dia in lote
+        ]))
+
+    ids_dias = db.execute(
+        select(PlanComidasDiario.id)
+        .where(PlanComidasDiario.id_plan_dieta == id_plan_dieta)
+        .order_by(PlanComidasDiario.id.desc())
+        .limit(len(dias))
+    ).scalars().all()[::-1]
+
+    detalles = [
+        {
+            "id_plan_diario": id_dia,
+            "tipo_comida": comida['tipo_comida'],
+            "plato": comida['plato'],
+            "proteinas": comida['proteinas'],
+            "grasas": comida['grasas'],
+            "carbohidratos": comida['carbohidratos'],
+            "calorias": comida['calorias']
+        }
+        for id_dia, dia in zip(ids_dias, dias)
+        for comida in dia['comidas']
+    ]
+    for lote in en_lotes(detalles):
+        db.execute(insert(DetallePlanComidas).values(lote))
+
+    return ids_dias
+
+def crear_cabecera_plan_comidas(db: Session, id_usuario: int) -> int:
+    """
+    Inserta la fila del plan (sin días) y retorna su id. No hace commit.
+    """
+    return db.execute(
+        insert(PlanDietaUsuario).values(id_usuario=id_usuario, id_estado_plan=1)  # estado activo
+    ).inserted_primary_key[0]
+
+def insertar_plan_comidas(db: Session, id_usuario: int, dias) -> int:
+    """
+    Persiste un plan de comidas completo con un número constante de sentencias:
+    el plan, los días, la resolución de ids y las comidas. No hace commit.
+    """
+    id_plan = crear_cabecera_plan_comidas(db, id_usuario)
+    insertar_dias_plan_comidas(db, id_plan, dias)
+    return id_plan
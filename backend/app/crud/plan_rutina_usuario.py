@@ -1,6 +1,11 @@
+from datetime import datetime
+from typing import List
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.models_auto import PlanRutinaUsuario
+from app.models.models_auto import PlanRutinaUsuario, PlanEntrenamientoDiario, DetallePlanEntrenamiento
 from app.schemas.plan_rutina_usuario import PlanRutinaCreate
+from app.utils.lotes import en_lotes
 
 def crear_plan_rutina(db: Session, datos: PlanRutinaCreate):
     nuevo = PlanRutinaUsuario(**datos.dict())
@@ -20,3 +25,141 @@ def actualizar_plan_rutina(db: Session, id: int, datos: PlanRutinaCreate):
         db.commit()
         db.refresh(plan)
     return plan
+
+def plan_entrenamiento_completo_stmt(id_usuario: int):
+    """
+    Construye la consulta que trae el plan de entrenamiento más reciente del
+    usuario junto con sus días y ejercicios en un solo SELECT.
+    """
+    ultimo_plan = (
+        select(func.max(PlanRutinaUsuario.id))
+        .where(PlanRutinaUsuario.id_usuario == id_usuario)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            PlanRutinaUsuario.id.label("id_plan"),
+            PlanEntrenamientoDiario.id.label("id_dia"),
+            PlanEntrenamientoDiario.fecha,
+            PlanEntrenamientoDiario.tipo_dia,
+            DetallePlanEntrenamiento.id.label("id_detalle"),
+            DetallePlanEntrenamiento.ejercicio,
+            DetallePlanEntrenamiento.series,
+            DetallePlanEntrenamiento.repeticiones
+        )
+        .select_from(PlanRutinaUsuario)
+        .outerjoin(PlanEntrenamientoDiario, PlanEntrenamientoDiario.id_plan_rutina == PlanRutinaUsuario.id)
+        .outerjoin(DetallePlanEntrenamiento, DetallePlanEntrenamiento.id_plan_diario == PlanEntrenamientoDiario.id)
+        .where(PlanRutinaUsuario.id == ultimo_plan)
+        .order_by(PlanEntrenamientoDiario.fecha, PlanEntrenamientoDiario.id, DetallePlanEntrenamiento.id)
+    )
+
+def armar_plan_entrenamiento(rows):
+    """
+    Agrupa las filas planas de plan_entrenamiento_completo_stmt en la
+    estructura que devuelve GET /api/training-plan. Retorna None si no hay plan.
+    """
+    if not rows:
+        return None
+
+    plan_completo = []
+    dia_actual = None
+    id_dia_actual = None
+    for row in rows:
+        if row.id_dia is None:
+            continue
+        if row.id_dia != id_dia_actual:
+            id_dia_actual = row.id_dia
+            dia_actual = {
+                "fecha": row.fecha.strftime("%Y-%m-%d"),
+                "tipo_dia": row.tipo_dia,
+                "ejercicios": []
+            }
+            plan_completo.append(dia_actual)
+        if row.id_detalle is not None:
+            dia_actual["ejercicios"].append({
+                "nombre": row.ejercicio,
+                "series": row.series,
+                "repeticiones": row.repeticiones,
+                "descanso": "60 seg",
+                "notas": ""
+            })
+    return plan_completo
+
+def obtener_plan_entrenamiento_completo(db: Session, id_usuario: int):
+    """
+    Obtiene el plan de entrenamiento más reciente del usuario con todos sus
+    días y ejercicios usando una única consulta a la base de datos.
+    """
+    rows = db.execute(plan_entrenamiento_completo_stmt(id_usuario)).all()
+    return armar_plan_entrenamiento(rows)
+
+async def obtener_plan_entrenamiento_completo_async(db: AsyncSession, id_usuario: int):
+    """
+    Igual que obtener_plan_entrenamiento_completo, para rutas que usan AsyncSession.
+    """
+    rows = (await db.execute(plan_entrenamiento_completo_stmt(id_usuario))).all()
+    return armar_plan_entrenamiento(rows)
+
+def insertar_dias_plan_entrenamiento(db: Session, id_plan_rutina: int, dias) -> List[int]:
+    """
+    Inserta días de un plan de entrenamiento y sus ejercicios con INSERT
+    multi-fila, resolviendo los ids de los días con un único SELECT.
+    No hace commit. Retorna los ids de los días en el orden recibido.
+    """
+    if not dias:
+        return []
+
+    for lote in en_lotes(dias):
+        db.execute(insert(PlanEntrenamientoDiario).values([
+            {
+                "id_plan_rutina": id_plan_rutina,
+                "fecha": datetime.strptime(dia['fecha'], '%Y-%m-%d').date(),
+                "tipo_dia": dia['tipo_dia']
+            }
+            for dia in lote
+        ]))
+
+    ids_dias = db.execute(
+        select(PlanEntrenamientoDiario.id)
+        .where(PlanEntrenamientoDiario.id_plan_rutina == id_plan_rutina)
+        .order_by(PlanEntrenamientoDiario.id.desc())
+        .limit(len(dias))
+    ).scalars().all()[::-1]
+
+    detalles = []
+    for id_dia, dia in zip(ids_dias, dias):
+        for ejercicio in dia['ejercicios']:
+            # Asegurar valores mínimos para ejercicios de fuerza
+            series = ejercicio['series']
+            repeticiones = ejercicio['repeticiones']
+            if dia['tipo_dia'].lower() == 'fuerza':
+                series = max(series, 3)
+                repeticiones = max(repeticiones, 8)
+            detalles.append({
+                "id_plan_diario": id_dia,
+                "ejercicio": ejercicio['nombre'],
+                "series": series,
+                "repeticiones": repeticiones
+            })
+    for lote in en_lotes(detalles):
+        db.execute(insert(DetallePlanEntrenamiento).values(lote))
+
+    return ids_dias
+
+def crear_cabecera_plan_entrenamiento(db: Session, id_usuario: int) -> int:
+    """
+    Inserta la fila del plan (sin días) y retorna su id. No hace commit.
+    """
+    return db.execute(
+        insert(PlanRutinaUsuario).values(id_usuario=id_usuario, id_estado_plan=1)  # estado activo
+    ).inserted_primary_key[0]
+
+def insertar_plan_entrenamiento(db: Session, id_usuario: int, dias) -> int:
+    """
+    Persiste un plan de entrenamiento completo con un número constante de
+    sentencias. No hace commit.
+    """
+    id_plan = crear_cabecera_plan_entrenamiento(db, id_usuario)
+    insertar_dias_plan_entrenamiento(db, id_plan, dias)
+    return id_plan
@@ -0,0 +1,289 @@
+import operator
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models_auto import SeguimientoMetrica
+from app.crud.metricas_salud import TIPO_METRICA_PESO, actualizar_metricas_salud
+from app.crud.seguimiento_metrica_resumen import acumular_en_resumen, recalcular_semana, valor_decimal
+from app.utils.lotes import en_lotes
+
+# Operadores de los filtros sobre claves de `detalles`
+OPERADORES_DETALLE = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+def condicion_detalle(clave: str, operador: str, valor):
+    """
+    Condición sobre una clave de `detalles` evaluada en MySQL con JSON_EXTRACT:
+    numérica si `valor` es un número, de texto en otro caso.
+    """
+    campo = SeguimientoMetrica.detalles[clave]
+    campo = campo.as_float() if isinstance(valor, (int, float)) else campo.as_string()
+    return OPERADORES_DETALLE[operador](campo, valor)
+
+async def listar_mediciones_async(
+    db: AsyncSession,
+    id_usuario: int,
+    columnas: Sequence[str],
+    tipo_metrica: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    cursor: Optional[Tuple[date, int]] = None,
+    limite: Optional[int] = None,
+    filtros_detalle: Sequence[Tuple[str, str, Any]] = ()
+):
+    """
+    Mediciones del usuario de la más reciente a la más antigua, solo con las
+    `columnas` pedidas. `cursor` es el (fecha, id) de la última fila de la
+    página anterior: se continúa por keyset sobre (fecha DESC, id DESC).
+    `filtros_detalle` son tuplas (clave, operador, valor) sobre `detalles`.
+    """
+    stmt = select(*(getattr(SeguimientoMetrica, c) for c in columnas)).where(SeguimientoMetrica.id_usuario == id_usuario)
+    if tipo_metrica:
+        stmt = stmt.where(SeguimientoMetrica.tipo_metrica == tipo_metrica)
+    if fecha_inicio:
+        stmt = stmt.where(SeguimientoMetrica.fecha >= fecha_inicio)
+    if fecha_fin:
+        stmt = stmt.where(SeguimientoMetrica.fecha <= fecha_fin)
+    for clave, operador, valor in filtros_detalle:
+        stmt = stmt.where(condicion_detalle(clave, operador, valor))
+    if cursor:
+        fecha_cursor, id_cursor = cursor
+        stmt = stmt.where(or_(
+            SeguimientoMetrica.fecha < fecha_cursor,
+            and_(SeguimientoMetrica.fecha == fecha_cursor, SeguimientoMetrica.id < id_cursor)
+        ))
+    stmt = stmt.order_by(SeguimientoMetrica.fecha.desc(), SeguimientoMetrica.id.desc())
+    if limite:
+        stmt = stmt.limit(limite)
+    result = await db.execute(stmt)
+    return result.all()
+
+async def resumir_detalles_async(
+    db: AsyncSession,
+    id_usuario: int,
+    tipo_metrica: str,
+    claves: Sequence[str],
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Cantidad, promedio, mínimo y máximo de claves numéricas de `detalles`
+    (p. ej. cintura y cadera de la relación cintura-cadera), calculados en
+    una sola consulta con JSON_EXTRACT. Las mediciones sin la clave no cuentan.
+    """
+    columnas = [func.count(SeguimientoMetrica.id).label("mediciones")]
+    for i, clave in enumerate(claves):
+        valor = SeguimientoMetrica.detalles[clave].as_float()
+        columnas += [
+            func.count(valor).label(f"n_{i}"),
+            func.avg(valor).label(f"promedio_{i}"),
+            func.min(valor).label(f"minimo_{i}"),
+            func.max(valor).label(f"maximo_{i}"),
+        ]
+
+    stmt = (
+        select(*columnas)
+        .where(SeguimientoMetrica.id_usuario == id_usuario)
+        .where(SeguimientoMetrica.tipo_metrica == tipo_metrica)
+    )
+    if fecha_inicio:
+        stmt = stmt.where(SeguimientoMetrica.fecha >= fecha_inicio)
+    if fecha_fin:
+        stmt = stmt.where(SeguimientoMetrica.fecha <= fecha_fin)
+
+    fila = (await db.execute(stmt)).one()._mapping
+
+    def numero(valor):
+        return round(float(valor), 4) if valor is not None else None
+
+    return {
+        "mediciones": fila["mediciones"],
+        "claves": {
+            clave: {
+                "mediciones": fila[f"n_{i}"],
+                "promedio": numero(fila[f"promedio_{i}"]),
+                "minimo": numero(fila[f"minimo_{i}"]),
+                "maximo": numero(fila[f"maximo_{i}"]),
+            }
+            for i, clave in enumerate(claves)
+        }
+    }
+
+def crear_medicion(db: Session, id_usuario: int, medicion: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inserta una medición y la suma al resumen, en una transacción. Un
+    'Peso corporal' recalcula además las métricas de salud del usuario.
+    La fila se arma con el id generado (lastrowid), el valor redondeado como
+    lo guarda la columna y las marcas de tiempo fijadas aquí, sin volver a
+    leerla. Las marcas de tiempo de seguimiento_metrica salen siempre del reloj
+    de la aplicación (igual que el onupdate de updated_at), no del servidor.
+    """
+    # DATETIME guarda segundos: se trunca para que la respuesta coincida con la fila
+    ahora = datetime.now().replace(microsecond=0)
+    fila = {
+        "id_usuario": id_usuario,
+        "tipo_metrica": medicion["tipo_metrica"],
+        "fecha": medicion["fecha"],
+        "valor_principal": valor_decimal(medicion["valor_principal"]),
+        "categoria": medicion["categoria"],
+        "detalles": medicion["detalles"] or None,
+        "created_at": ahora,
+        "updated_at": ahora,
+    }
+    result = db.execute(
+        insert(SeguimientoMetrica).values(fila)
+    )
+    acumular_en_resumen(db, [fila])
+    if fila["tipo_metrica"] == TIPO_METRICA_PESO:
+        actualizar_metricas_salud(db, id_usuario)
+    db.commit()
+    return {"id": result.inserted_primary_key[0], **fila}
+
+def eliminar_medicion(
+    db: Session,
+    id_usuario: int,
+    id_metrica: int,
+    tipo_metrica: Optional[str] = None,
+    fecha: Optional[date] = None
+) -> bool:
+    """
+    Elimina una medición del usuario con un único DELETE y recalcula su semana
+    en el resumen (y las métricas de salud si era un 'Peso corporal'). Si el
+    cliente envía tipo_metrica y fecha se usan como parte del filtro; si no, se
+    obtienen con RETURNING cuando el dialecto lo admite (MariaDB, SQLite) o con
+    un SELECT previo en MySQL.
+
+    Retorna False si la medición no existe o no pertenece al usuario.
+    """
+    # Sin sincronizar la sesión: con 'fetch' el ORM emitiría un SELECT previo
+    stmt = (
+        delete(SeguimientoMetrica)
+        .execution_options(synchronize_session=False)
+        .where(SeguimientoMetrica.id == id_metrica)
+        .where(SeguimientoMetrica.id_usuario == id_usuario)
+    )
+    if tipo_metrica is not None and fecha is not None:
+        stmt = stmt.where(SeguimientoMetrica.tipo_metrica == tipo_metrica).where(SeguimientoMetrica.fecha == fecha)
+        if db.execute(stmt).rowcount == 0:
+            return False
+    elif db.get_bind().dialect.delete_returning:
+        fila = db.execute(
+            stmt.returning(SeguimientoMetrica.tipo_metrica, SeguimientoMetrica.fecha)
+        ).fetchone()
+        if fila is None:
+            return False
+        tipo_metrica, fecha = fila
+    else:
+        fila = db.execute(
+            select(SeguimientoMetrica.tipo_metrica, SeguimientoMetrica.fecha)
+            .where(SeguimientoMetrica.id == id_metrica)
+            .where(SeguimientoMetrica.id_usuario == id_usuario)
+        ).fetchone()
+        if fila is None:
+            return False
+        tipo_metrica, fecha = fila
+        db.execute(stmt)
+
+    recalcular_semana(db, id_usuario, tipo_metrica, fecha)
+    if tipo_metrica == TIPO_METRICA_PESO:
+        actualizar_metricas_salud(db, id_usuario)
+    db.commit()
+    return True
+
+def _ids_por_clave(db: Session, id_usuario: int, claves: Sequence[str]) -> Dict[str, int]:
+    result = db.execute(
+        select(SeguimientoMetrica.clave_idempotencia, SeguimientoMetrica.id)
+        .where(SeguimientoMetrica.id_usuario == id_usuario)
+        .where(SeguimientoMetrica.clave_idempotencia.in_(claves))
+    )
+    return {clave: id_metrica for clave, id_metrica in result}
+
+def _insertar_lote(
+    db: Session,
+    id_usuario: int,
+    lote: Sequence[Dict[str, Any]],
+    ahora: datetime
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Inserta las mediciones del lote cuya clave aún no existe para el usuario y
+    las suma al resumen. No hace commit.
+
+    Retorna (ids de las claves que ya existían, ids de las insertadas).
+    """
+    existentes = _ids_por_clave(db, id_usuario, [m["clave_idempotencia"] for m in lote])
+    nuevas = [m for m in lote if m["clave_idempotencia"] not in existentes]
+    if not nuevas:
+        return existentes, {}
+
+    db.execute(
+        insert(SeguimientoMetrica).values([
+            {
+                "id_usuario": id_usuario,
+                "tipo_metrica": m["tipo_metrica"],
+                "fecha": m["fecha"],
+                "valor_principal": valor_decimal(m["valor_principal"]),
+                "categoria": m["categoria"],
+                "detalles": m["detalles"] or None,
+                "clave_idempotencia": m["clave_idempotencia"],
+                "created_at": ahora,
+                "updated_at": ahora,
+            }
+            for m in nuevas
+        ])
+    )
+    acumular_en_resumen(db, [{"id_usuario": id_usuario, **m} for m in nuevas])
+    if any(m["tipo_metrica"] == TIPO_METRICA_PESO for m in nuevas):
+        actualizar_metricas_salud(db, id_usuario)
+    return existentes, _ids_por_clave(db, id_usuario, [m["clave_idempotencia"] for m in nuevas])
+
+def insertar_mediciones_lote(db: Session, id_usuario: int, mediciones: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Inserta mediciones ya validadas (tipo_metrica, fecha, valor_principal,
+    categoria, detalles, clave_idempotencia) con un INSERT multi-fila y un
+    commit por lote, y actualiza el resumen de métricas en la misma transacción.
+
+    Los lotes con 'Peso corporal' recalculan las métricas de salud del usuario.
+
+    Las claves que ya existen para el usuario no se vuelven a insertar: un
+    reintento del mismo lote solo devuelve los ids existentes.
+
+    Retorna, en el orden recibido, {"id", "estado"} con estado 'creado',
+    'duplicado' o 'error' (un lote que falla se revierte completo y sus
+    mediciones se marcan con el error).
+    """
+    resultados = []
+    ahora = datetime.now().replace(microsecond=0)
+    for lote in en_lotes(mediciones):
+        try:
+            try:
+                existentes, ids = _insertar_lote(db, id_usuario, lote, ahora)
+            except IntegrityError:
+                # Un reintento concurrente insertó alguna clave entre la consulta y
+                # el INSERT: se repite una vez sin ellas. Si vuelve a fallar es un
+                # error de los datos y el lote se reporta como tal
+                db.rollback()
+                existentes, ids = _insertar_lote(db, id_usuario, lote, ahora)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            resultados.extend({"id": None, "estado": "error", "error": str(e)} for _ in lote)
+            continue
+
+        for medicion in lote:
+            clave = medicion["clave_idempotencia"]
+            if clave in existentes:
+                resultados.append({"id": existentes[clave], "estado": "duplicado"})
+            else:
+                resultados.append({"id": ids[clave], "estado": "creado"})
+    return resultados
@@ -0,0 +1,216 @@
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import DECIMAL, Date, case, cast, delete, func, literal, select
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.models.models_auto import SeguimientoMetrica, SeguimientoMetricaResumen
+from app.utils.lotes import en_lotes
+
+GRANULARIDADES = ('dia', 'semana')
+
+# Escala de seguimiento_metrica.valor_principal, DECIMAL(10, 2)
+ESCALA_VALOR = Decimal('0.01')
+
+def valor_decimal(valor) -> Decimal:
+    """
+    valor_principal tal como lo guarda la columna DECIMAL(10, 2): redondeado a
+    dos decimales con ROUND_HALF_UP, igual que MySQL al insertar.
+    """
+    return Decimal(str(valor)).quantize(ESCALA_VALOR, rounding=ROUND_HALF_UP)
+
+def inicio_intervalo(intervalo: str, columna):
+    """
+    Expresión con el inicio del intervalo que contiene `columna`: la propia
+    fecha, el lunes de la semana o el día 1 del mes.
+    """
+    if intervalo == 'semana':
+        return func.subdate(columna, func.weekday(columna), type_=Date)
+    if intervalo == 'mes':
+        return func.subdate(columna, func.dayofmonth(columna) - 1, type_=Date)
+    return columna
+
+class UltimoValor(FunctionElement):
+    """
+    UltimoValor(valor, *orden): agregado con el `valor` de la fila que queda
+    primera al ordenar por `orden` de mayor a menor. En MySQL es el primer
+    elemento de GROUP_CONCAT ordenado; truncar la lista no lo afecta.
+    """
+    name = 'ultimo_valor'
+    inherit_cache = True
+
+@compiles(UltimoValor)
+def _ultimo_valor_mysql(element, compiler, **kw):
+    valor, *orden = [compiler.process(c, **kw) for c in element.clauses]
+    return f"SUBSTRING_INDEX(GROUP_CONCAT({valor} ORDER BY {', '.join(f'{c} DESC' for c in orden)}), ',', 1)"
+
+def inicio_periodo(granularidad: str, fecha: date) -> date:
+    """
+    Equivalente en Python de inicio_intervalo para 'dia' y 'semana'.
+    """
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    return fecha
+
+def acumular_en_resumen(db: Session, mediciones: Sequence[Dict[str, Any]]) -> None:
+    """
+    Suma mediciones nuevas (id_usuario, tipo_metrica, fecha, valor_principal) a
+    sus periodos diario y semanal con INSERT ... ON DUPLICATE KEY UPDATE, en
+    sentencias multi-fila. No hace commit: se confirma junto con el INSERT de
+    las mediciones.
+
+    Las mediciones deben llegar en el orden en que se insertaron: ante fechas
+    iguales, la última pasa a ser el último valor del periodo, igual que el
+    desempate por id de recalcular_resumen.
+    """
+    filas = []
+    for medicion in mediciones:
+        valor = valor_decimal(medicion["valor_principal"])
+        x = medicion["fecha"].toordinal() + 365  # TO_DAYS(fecha)
+        for granularidad in GRANULARIDADES:
+            filas.append({
+                "id_usuario": medicion["id_usuario"],
+                "tipo_metrica": medicion["tipo_metrica"],
+                "granularidad": granularidad,
+                "inicio": inicio_periodo(granularidad, medicion["fecha"]),
+                "mediciones": 1,
+                "suma": valor,
+                "minimo": valor,
+                "maximo": valor,
+                "ultimo_valor": valor,
+                "ultima_fecha": medicion["fecha"],
+                "suma_x": x,
+                "suma_xy": x * valor,
+                "suma_xx": x * x,
+            })
+
+    resumen = SeguimientoMetricaResumen.__table__.c
+    for lote in en_lotes(filas):
+        stmt = insert(SeguimientoMetricaResumen).values(lote)
+        nuevo = stmt.inserted
+        # MySQL aplica las asignaciones en orden: ultimo_valor se compara con la
+        # ultima_fecha anterior, antes de actualizarla
+        stmt = stmt.on_duplicate_key_update([
+            ("ultimo_valor", case(
+                (nuevo.ultima_fecha >= resumen.ultima_fecha, nuevo.ultimo_valor),
+                else_=resumen.ultimo_valor
+            )),
+            ("ultima_fecha", func.greatest(resumen.ultima_fecha, nuevo.ultima_fecha)),
+            ("mediciones", resumen.mediciones + nuevo.mediciones),
+            ("suma", resumen.suma + nuevo.suma),
+            ("minimo", func.least(resumen.minimo, nuevo.minimo)),
+            ("maximo", func.greatest(resumen.maximo, nuevo.maximo)),
+            ("suma_x", resumen.suma_x + nuevo.suma_x),
+            ("suma_xy", resumen.suma_xy + nuevo.suma_xy),
+            ("suma_xx", resumen.suma_xx + nuevo.suma_xx),
+        ])
+        db.execute(stmt)
+
+def recalcular_resumen(
+    db: Session,
+    id_usuario: Optional[int] = None,
+    tipo_metrica: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+) -> int:
+    """
+    Reconstruye el resumen a partir de seguimiento_metrica, completo o
+    restringido a un usuario, una métrica y/o un rango de fechas. El rango
+    debe abarcar semanas completas (de lunes a domingo) para que los periodos
+    semanales se recalculen con todas sus mediciones. No hace commit.
+
+    Retorna el número de filas de resumen insertadas.
+    """
+    r, m = SeguimientoMetricaResumen, SeguimientoMetrica
+    filtro_resumen = []
+    filtro_mediciones = []
+    if id_usuario is not None:
+        filtro_resumen.append(r.id_usuario == id_usuario)
+        filtro_mediciones.append(m.id_usuario == id_usuario)
+    if tipo_metrica is not None:
+        filtro_resumen.append(r.tipo_metrica == tipo_metrica)
+        filtro_mediciones.append(m.tipo_metrica == tipo_metrica)
+    if desde is not None:
+        filtro_resumen.append(r.inicio >= desde)
+        filtro_mediciones.append(m.fecha >= desde)
+    if hasta is not None:
+        filtro_resumen.append(r.inicio <= hasta)
+        filtro_mediciones.append(m.fecha <= hasta)
+
+    db.execute(delete(r).where(*filtro_resumen))
+
+    columnas = [
+        r.id_usuario, r.tipo_metrica, r.granularidad, r.inicio, r.mediciones, r.suma, r.minimo, r.maximo,
+        r.ultimo_valor, r.ultima_fecha, r.suma_x, r.suma_xy, r.suma_xx
+    ]
+    x = func.to_days(m.fecha)
+    insertadas = 0
+    for granularidad in GRANULARIDADES:
+        periodo = inicio_intervalo(granularidad, m.fecha).label("periodo")
+        seleccion = (
+            select(
+                m.id_usuario, m.tipo_metrica, literal(granularidad), periodo,
+                func.count(), func.sum(m.valor_principal), func.min(m.valor_principal), func.max(m.valor_principal),
+                # Ante fechas iguales gana la medición insertada última, como en acumular_en_resumen
+                cast(UltimoValor(m.valor_principal, m.fecha, m.id), DECIMAL(12, 4)),
+                func.max(m.fecha), func.sum(x), func.sum(x * m.valor_principal), func.sum(x * x)
+            )
+            .where(*filtro_mediciones)
+            .group_by(m.id_usuario, m.tipo_metrica, periodo.name)
+        )
+        result = db.execute(insert(r).from_select(columnas, seleccion))
+        insertadas += result.rowcount
+    return insertadas
+
+def recalcular_semana(db: Session, id_usuario: int, tipo_metrica: str, fecha: date) -> None:
+    """
+    Recalcula los periodos diarios y el semanal que contienen `fecha`, p. ej.
+    tras eliminar una medición (el mínimo, el máximo y el último valor no se
+    pueden descontar de forma incremental). No hace commit.
+    """
+    lunes = inicio_periodo('semana', fecha)
+    recalcular_resumen(db, id_usuario, tipo_metrica, lunes, lunes + timedelta(days=6))
+
+def serie_stmt(
+    id_usuario: int,
+    tipo_metrica: str,
+    intervalo: str,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+):
+    """
+    Periodos de la métrica agrupados por `intervalo`, en orden cronológico,
+    con el número de mediciones, el promedio, el mínimo, el máximo, el último
+    valor y las sumas para la pendiente. Las semanas sin rango de fechas se
+    leen del resumen semanal; el resto se agrupa a partir del diario.
+    """
+    granularidad = 'semana' if intervalo == 'semana' and not (fecha_inicio or fecha_fin) else 'dia'
+    r = SeguimientoMetricaResumen
+    periodo = inicio_intervalo(intervalo, r.inicio).label("periodo")
+    stmt = (
+        select(
+            periodo,
+            func.sum(r.mediciones).label("mediciones"),
+            (func.sum(r.suma) / func.sum(r.mediciones)).label("promedio"),
+            func.min(r.minimo).label("minimo"),
+            func.max(r.maximo).label("maximo"),
+            UltimoValor(r.ultimo_valor, r.inicio).label("ultimo"),
+            func.sum(r.suma_x).label("suma_x"),
+            func.sum(r.suma).label("suma_y"),
+            func.sum(r.suma_xy).label("suma_xy"),
+            func.sum(r.suma_xx).label("suma_xx"),
+        )
+        .where(r.id_usuario == id_usuario)
+        .where(r.tipo_metrica == tipo_metrica)
+        .where(r.granularidad == granularidad)
+    )
+    if fecha_inicio:
+        stmt = stmt.where(r.inicio >= fecha_inicio)
+    if fecha_fin:
+        stmt = stmt.where(r.inicio <= fecha_fin)
+    # Agrupar por el alias evita repetir la expresión (y sus parámetros) en GROUP BY
+    return stmt.group_by(periodo.name).order_by(periodo.name)
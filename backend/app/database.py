@@ -1,6 +1,13 @@
+from collections import deque
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import AsyncIterator, Optional
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import orjson
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 
@@ -10,19 +17,165 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
+# Driver DBAPI: mysqlconnector (puro Python), mysqldb (mysqlclient, en C) o pymysql
+DB_DRIVER = os.getenv("DB_DRIVER", "mysqlconnector")
+# Driver asíncrono para AsyncSession: aiomysql o asyncmy
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "aiomysql")
 
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# Pool de conexiones; dimensionar según workers de uvicorn x conexiones por worker
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Reciclar antes del wait_timeout de MySQL para no usar conexiones cerradas por el servidor
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Pool propio del motor asíncrono; las conexiones por proceso son la suma de ambos pools
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5"))
 
-engine = create_engine(DATABASE_URL)
+def construir_url(driver: str) -> str:
+    return f"mysql+{driver}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+
+DATABASE_URL = construir_url(DB_DRIVER)
+
+# Serialización de las columnas JSON (p. ej. seguimiento_metrica.detalles) con orjson
+def json_serializer(valor) -> str:
+    return orjson.dumps(valor).decode()
+
+def json_deserializer(valor):
+    return orjson.loads(valor)
+
+
+class QueuePoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout hasta obtener una conexión
+    (incluye abrir una conexión nueva cuando el pool crece). Una espera alta
+    indica que el pool es chico para la concurrencia del proceso.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self._esperas_ms = deque(maxlen=1000)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total_ms = 0.0
+        self.espera_max_ms = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._lock_metricas:
+                self.timeouts += 1
+            raise
+        finally:
+            espera = (time.perf_counter() - inicio) * 1000
+            with self._lock_metricas:
+                self.checkouts += 1
+                self.espera_total_ms += espera
+                self.espera_max_ms = max(self.espera_max_ms, espera)
+                self._esperas_ms.append(espera)
+
+    def metricas(self) -> dict:
+        with self._lock_metricas:
+            esperas = sorted(self._esperas_ms)
+            checkouts = self.checkouts
+            total = self.espera_total_ms
+            maximo = self.espera_max_ms
+            timeouts = self.timeouts
+        return {
+            "tamano": self.size(),
+            "en_uso": self.checkedout(),
+            "disponibles": self.checkedin(),
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "espera_media_ms": round(total / checkouts, 3) if checkouts else 0.0,
+            "espera_p99_ms": round(esperas[int((len(esperas) - 1) * 0.99)], 3) if esperas else 0.0,
+            "espera_max_ms": round(maximo, 3),
+        }
+
+
+class AsyncAdaptedQueuePoolMedido(QueuePoolMedido, AsyncAdaptedQueuePool):
+    """
+    QueuePoolMedido para el motor asíncrono (el pool de su sync_engine).
+    """
+
+
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=QueuePoolMedido,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    json_serializer=json_serializer,
+    json_deserializer=json_deserializer
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def metricas_pool() -> dict:
+    """
+    Gauges del pool de conexiones y tiempos de espera de checkout.
+    """
+    return engine.pool.metricas()
+
+def metricas_pool_async() -> Optional[dict]:
+    """
+    Igual que metricas_pool para el motor asíncrono, o None si aún no se creó.
+    """
+    if _async_engine is None:
+        return None
+    return _async_engine.sync_engine.pool.metricas()
+
 # Dependencia para FastAPI
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Motor asíncrono: se crea en el primer uso para no exigir el driver async
+# a los scripts que solo usan la sesión síncrona
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            construir_url(DB_ASYNC_DRIVER),
+            poolclass=AsyncAdaptedQueuePoolMedido,
+            pool_size=DB_ASYNC_POOL_SIZE,
+            max_overflow=DB_ASYNC_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            json_serializer=json_serializer,
+            json_deserializer=json_deserializer
+        )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+def AsyncSessionLocal() -> AsyncSession:
+    get_async_engine()
+    return _AsyncSessionLocal()
+
+# Dependencia asíncrona para FastAPI: las consultas no bloquean el event loop
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def cerrar_async_engine() -> None:
+    if _async_engine is not None:
+        await _async_engine.dispose()
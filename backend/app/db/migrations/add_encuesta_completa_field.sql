@@ -0,0 +1,2 @@
+ALTER TABLE Perfil_Usuario
+ADD COLUMN encuesta_completa TINYINT(1) NULL;
@@ -0,0 +1,7 @@
+-- Clave de idempotencia de las cargas por lote ('<Idempotency-Key>:<índice>');
+-- NULL en las mediciones registradas de a una. El índice único hace seguros los reintentos.
+ALTER TABLE seguimiento_metrica
+ADD COLUMN clave_idempotencia VARCHAR(100) NULL;
+
+CREATE UNIQUE INDEX idx_seguimiento_usuario_clave
+ON seguimiento_metrica (id_usuario, clave_idempotencia);
@@ -0,0 +1,8 @@
+-- Historial por tipo de métrica: filtra por (id_usuario, tipo_metrica) y recorre fecha en orden;
+-- InnoDB agrega la clave primaria (id) al final del índice, que completa el cursor (fecha, id)
+CREATE INDEX idx_seguimiento_usuario_tipo_fecha
+ON seguimiento_metrica (id_usuario, tipo_metrica, fecha);
+
+-- Historial completo del usuario (sin filtro de tipo) ordenado por fecha
+CREATE INDEX idx_seguimiento_usuario_fecha
+ON seguimiento_metrica (id_usuario, fecha);
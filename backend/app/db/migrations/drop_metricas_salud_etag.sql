@@ -0,0 +1,4 @@
+-- El ETag de GET /api/usuarios/me/health-metrics se calcula al leer a partir
+-- de las métricas guardadas: la columna ya no se escribe
+ALTER TABLE Metricas_Salud_Perfil
+DROP COLUMN etag;
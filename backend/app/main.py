@@ -1,13 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import survey, usuarios, survey_data, seguimiento, training, meal, youtube
-from .database import engine
+from .routes import survey, usuarios, survey_data, seguimiento, training, meal, youtube, metrics, jobs as jobs_routes
+from .services import jobs
+from .database import engine, cerrar_async_engine
+from .utils.respuestas import RespuestaJSONRapida
 from .models import models_auto as models
 
 # Crear las tablas en la base de datos
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# orjson para todas las respuestas JSON (fechas y Decimal incluidos)
+app = FastAPI(default_response_class=RespuestaJSONRapida)
 
 # Configuración de CORS
 origins = [
@@ -37,6 +40,18 @@ app.include_router(seguimiento.router, prefix="/api")
 app.include_router(training.router, prefix="/api")
 app.include_router(meal.router, prefix="/api")
 app.include_router(youtube.router, prefix="/api", tags=["youtube"])
+app.include_router(jobs_routes.router, prefix="/api", tags=["jobs"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+
+# Workers de la cola de generación de planes
+@app.on_event("startup")
+async def iniciar_cola_trabajos():
+    await jobs.iniciar_workers()
+
+@app.on_event("shutdown")
+async def detener_cola_trabajos():
+    await jobs.detener_workers()
+    await cerrar_async_engine()
 
 @app.get("/")
 async def root():
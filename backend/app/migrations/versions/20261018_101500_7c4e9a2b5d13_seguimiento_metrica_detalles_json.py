@@ -0,0 +1,48 @@
+"""seguimiento_metrica_detalles_json
+
+Revision ID: 7c4e9a2b5d13
+Revises: 221120ca61a5
+Create Date: 2026-10-18 10:15:00.000000-04:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e9a2b5d13'
+down_revision: Union[str, None] = '221120ca61a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backfill: el texto vacío, 'null' o inválido impediría convertir la columna a JSON
+    op.execute(
+        """
+        UPDATE seguimiento_metrica
+        SET detalles = NULL
+        WHERE detalles IS NOT NULL
+        AND (TRIM(detalles) IN ('', 'null') OR JSON_VALID(detalles) = 0)
+        """
+    )
+    # MySQL valida y convierte a JSON binario el texto de cada fila
+    op.alter_column(
+        'seguimiento_metrica',
+        'detalles',
+        existing_type=mysql.TEXT(),
+        type_=mysql.JSON(),
+        existing_nullable=True
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'seguimiento_metrica',
+        'detalles',
+        existing_type=mysql.JSON(),
+        type_=mysql.TEXT(),
+        existing_nullable=True
+    )
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from sqlalchemy import DECIMAL, Date, Enum, ForeignKeyConstraint, Index, Integer, String, Text, text
+from sqlalchemy import BigInteger, DECIMAL, Date, DateTime, Enum, ForeignKeyConstraint, Index, Integer, JSON, String, Text, text
 from sqlalchemy.dialects.mysql import TINYINT
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 import datetime
@@ -119,6 +119,8 @@ class PerfilUsuario(Base):
     nivel_compromiso: Mapped[Optional[int]] = mapped_column(TINYINT)
     medicion_progreso: Mapped[Optional[str]] = mapped_column(String(255))
     id_usuario: Mapped[Optional[int]] = mapped_column(Integer)
+    # Caché del estado de la encuesta: NULL = sin calcular (ver crud.perfil_usuario)
+    encuesta_completa: Mapped[Optional[int]] = mapped_column(TINYINT(1))
 
     usuario: Mapped[Optional['Usuario']] = relationship('Usuario', back_populates='perfil_usuario')
     alimentos_evitados: Mapped[List['AlimentosEvitados']] = relationship('AlimentosEvitados', back_populates='perfil_usuario')
@@ -421,3 +423,96 @@ class DetallePlanComidas(Base):
     calorias: Mapped[Optional[decimal.Decimal]] = mapped_column(DECIMAL(6, 2))
 
     plan_comidas_diario: Mapped[Optional['PlanComidasDiario']] = relationship('PlanComidasDiario', back_populates='detalles_comidas')
+
+
+class TrabajoGeneracion(Base):
+    __tablename__ = 'Trabajo_Generacion'
+    __table_args__ = (
+        ForeignKeyConstraint(['id_usuario'], ['Usuario.id'], name='trabajo_generacion_ibfk_1'),
+        Index('id_usuario', 'id_usuario'),
+        Index('clave_activa', 'clave_activa', unique=True),
+        Index('idx_estado', 'estado', 'id')
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id_usuario: Mapped[int] = mapped_column(Integer)
+    tipo: Mapped[str] = mapped_column(Enum('comidas', 'entrenamiento'))
+    estado: Mapped[str] = mapped_column(Enum('pendiente', 'en_proceso', 'completado', 'error'), server_default=text("'pendiente'"))
+    # '<id_usuario>:<tipo>' mientras el trabajo está activo; NULL al terminar. El índice único evita duplicados.
+    clave_activa: Mapped[Optional[str]] = mapped_column(String(60))
+    intentos: Mapped[int] = mapped_column(Integer, server_default=text("'0'"))
+    resultado: Mapped[Optional[str]] = mapped_column(Text)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    creado: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    actualizado: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'), onupdate=datetime.datetime.now)
+
+
+class SeguimientoMetrica(Base):
+    __tablename__ = 'seguimiento_metrica'
+    __table_args__ = (
+        ForeignKeyConstraint(['id_usuario'], ['Usuario.id'], name='seguimiento_metrica_ibfk_1'),
+        Index('idx_seguimiento_usuario_tipo_fecha', 'id_usuario', 'tipo_metrica', 'fecha'),
+        Index('idx_seguimiento_usuario_fecha', 'id_usuario', 'fecha'),
+        Index('idx_seguimiento_usuario_clave', 'id_usuario', 'clave_idempotencia', unique=True)
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id_usuario: Mapped[int] = mapped_column(Integer)
+    tipo_metrica: Mapped[str] = mapped_column(String(100))
+    fecha: Mapped[datetime.date] = mapped_column(Date)
+    valor_principal: Mapped[decimal.Decimal] = mapped_column(DECIMAL(10, 2))
+    categoria: Mapped[Optional[str]] = mapped_column(String(50))
+    # JSON nativo: se filtra y agrega con JSON_EXTRACT sin parsear en Python
+    detalles: Mapped[Optional[dict]] = mapped_column(JSON(none_as_null=True))
+    # '<Idempotency-Key>:<índice>' en las cargas por lote; NULL en las mediciones individuales
+    clave_idempotencia: Mapped[Optional[str]] = mapped_column(String(100))
+    created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'), onupdate=datetime.datetime.now)
+
+
+# Resumen diario y semanal de seguimiento_metrica por usuario y tipo de métrica,
+# mantenido por crud.seguimiento_metrica_resumen al registrar y eliminar mediciones
+class SeguimientoMetricaResumen(Base):
+    __tablename__ = 'Seguimiento_Metrica_Resumen'
+    __table_args__ = (
+        ForeignKeyConstraint(['id_usuario'], ['Usuario.id'], name='seguimiento_metrica_resumen_ibfk_1'),
+    )
+
+    id_usuario: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tipo_metrica: Mapped[str] = mapped_column(String(100), primary_key=True)
+    granularidad: Mapped[str] = mapped_column(Enum('dia', 'semana'), primary_key=True)
+    # Día de la medición o lunes de la semana
+    inicio: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    mediciones: Mapped[int] = mapped_column(Integer)
+    suma: Mapped[decimal.Decimal] = mapped_column(DECIMAL(20, 4))
+    minimo: Mapped[decimal.Decimal] = mapped_column(DECIMAL(12, 4))
+    maximo: Mapped[decimal.Decimal] = mapped_column(DECIMAL(12, 4))
+    ultimo_valor: Mapped[decimal.Decimal] = mapped_column(DECIMAL(12, 4))
+    ultima_fecha: Mapped[datetime.date] = mapped_column(Date)
+    # Sumas para la pendiente de mínimos cuadrados con x = TO_DAYS(fecha)
+    suma_x: Mapped[int] = mapped_column(BigInteger)
+    suma_xy: Mapped[decimal.Decimal] = mapped_column(DECIMAL(30, 4))
+    suma_xx: Mapped[int] = mapped_column(BigInteger)
+
+
+# Métricas de salud calculadas del perfil (GET /api/usuarios/me/health-metrics),
+# recalculadas por crud.metricas_salud al guardar la encuesta o registrar un peso
+class MetricasSaludPerfil(Base):
+    __tablename__ = 'Metricas_Salud_Perfil'
+    __table_args__ = (
+        ForeignKeyConstraint(['id_usuario'], ['Usuario.id'], name='metricas_salud_perfil_ibfk_1'),
+        ForeignKeyConstraint(['id_perfil'], ['Perfil_Usuario.id'], name='metricas_salud_perfil_ibfk_2'),
+        Index('id_perfil', 'id_perfil')
+    )
+
+    id_usuario: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id_perfil: Mapped[int] = mapped_column(Integer)
+    # Último 'Peso corporal' registrado o, si no hay, el peso de la encuesta
+    peso_actual: Mapped[decimal.Decimal] = mapped_column(DECIMAL(10, 2))
+    tmb: Mapped[decimal.Decimal] = mapped_column(DECIMAL(8, 2))
+    peso_ideal: Mapped[decimal.Decimal] = mapped_column(DECIMAL(8, 2))
+    frecuencia_cardiaca_maxima: Mapped[int] = mapped_column(Integer)
+    imc: Mapped[decimal.Decimal] = mapped_column(DECIMAL(8, 2))
+    categoria_imc: Mapped[str] = mapped_column(String(30))
+    diferencia_peso: Mapped[decimal.Decimal] = mapped_column(DECIMAL(10, 2))
+    calculado_en: Mapped[datetime.datetime] = mapped_column(DateTime)
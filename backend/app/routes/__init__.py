@@ -4,5 +4,7 @@ from . import survey_data
 from . import seguimiento
 from . import training
 from . import meal
+from . import jobs
+from . import metrics
 
-__all__ = ['survey', 'usuarios', 'survey_data', 'seguimiento', 'training', 'meal'] 
\ No newline at end of file
+__all__ = ['survey', 'usuarios', 'survey_data', 'seguimiento', 'training', 'meal', 'jobs', 'metrics'] 
\ No newline at end of file
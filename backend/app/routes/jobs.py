@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+import asyncio
+import logging
+from app.database import get_db, SessionLocal
+from app.models.base import User
+from app.auth import get_current_user
+from app.services import jobs
+from app.utils.sse import CABECERAS_SSE, formatear_evento
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+security = HTTPBearer()
+
+def _encolar(db: Session, id_usuario: int, tipo: str) -> dict:
+    try:
+        trabajo = jobs.encolar_trabajo(db, id_usuario, tipo)
+        return jobs.serializar_trabajo(trabajo)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al encolar el trabajo de {tipo}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al encolar el trabajo: {str(e)}")
+
+@router.post("/generate-meal-plan/jobs", status_code=202)
+async def enqueue_meal_plan(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Encola la generación del plan de comidas y responde de inmediato con el trabajo.
+    """
+    return _encolar(db, current_user.id, "comidas")
+
+@router.post("/generate-training-plan/jobs", status_code=202)
+async def enqueue_training_plan(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Encola la generación del plan de entrenamiento y responde de inmediato con el trabajo.
+    """
+    return _encolar(db, current_user.id, "entrenamiento")
+
+@router.get("/jobs/{id_trabajo}")
+async def get_job(
+    id_trabajo: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Consulta el estado de un trabajo de generación.
+    """
+    trabajo = jobs.obtener_trabajo(db, id_trabajo, current_user.id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return jobs.serializar_trabajo(trabajo)
+
+def _leer_estado(id_trabajo: int, id_usuario: int):
+    with SessionLocal() as db:
+        trabajo = jobs.obtener_trabajo(db, id_trabajo, id_usuario)
+        return jobs.serializar_trabajo(trabajo) if trabajo else None
+
+@router.get("/jobs/{id_trabajo}/events")
+async def stream_job(
+    id_trabajo: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Emite el estado del trabajo como server-sent events hasta que termina.
+    """
+    inicial = await run_in_threadpool(_leer_estado, id_trabajo, current_user.id)
+    if inicial is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    async def eventos():
+        estado = inicial
+        ultimo = None
+        while True:
+            if estado != ultimo:
+                yield formatear_evento("estado", estado)
+                ultimo = estado
+            if estado["estado"] in jobs.ESTADOS_FINALES:
+                break
+            await asyncio.sleep(1)
+            estado = await run_in_threadpool(_leer_estado, id_trabajo, current_user.id)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers=CABECERAS_SSE)
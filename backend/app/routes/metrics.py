@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+import logging
+import os
+import secrets
+from app.database import metricas_pool, metricas_pool_async
+from app.services import plan_cache
+from app.utils.cache import CACHES
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Token que debe enviar el monitoreo en X-Metrics-Token. Sin token configurado
+# el endpoint no se expone.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def verificar_token_metricas(x_metrics_token: Optional[str] = Header(None, alias="X-Metrics-Token")) -> None:
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_metrics_token is None or not secrets.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+
+
+@router.get("/metrics", dependencies=[Depends(verificar_token_metricas)])
+async def get_metrics():
+    """
+    Contadores internos del proceso (cachés y pools de conexiones) para monitoreo.
+    """
+    return {
+        "db_pool": metricas_pool(),
+        "db_pool_async": metricas_pool_async(),
+        "plan_cache": plan_cache.estadisticas(),
+        "caches": {nombre: cache.estadisticas() for nombre, cache in CACHES.items()}
+    }
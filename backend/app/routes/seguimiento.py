@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import date, datetime
-from pydantic import BaseModel
-import json
-from sqlalchemy import text
+from pydantic import BaseModel, ValidationError
+import base64
+import binascii
+import orjson
+import re
 import traceback
 import logging
+import uuid
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.auth import get_current_user
 from app.models.seguimiento import SeguimientoMetrica, SeguimientoMetricaCreate
+from app.crud.seguimiento_metrica import (
+    crear_medicion, eliminar_medicion, insertar_mediciones_lote, listar_mediciones_async, resumir_detalles_async
+)
+from app.crud.seguimiento_metrica_resumen import serie_stmt
+from app.utils.series import medias_moviles, pendiente_minimos_cuadrados
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG)
@@ -62,6 +73,34 @@ class SeguimientoMetricaDelete(BaseModel):
             }
         }
 
+class PuntoSerie(BaseModel):
+    inicio: date
+    mediciones: int
+    promedio: float
+    minimo: float
+    maximo: float
+    ultimo: float
+    media_movil: float
+
+class SerieMetrica(BaseModel):
+    tipo_metrica: str
+    intervalo: str
+    ventana: int
+    pendiente_por_dia: Optional[float] = None
+    puntos: List[PuntoSerie]
+
+class ResultadoMedicionLote(BaseModel):
+    indice: int
+    estado: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class RespuestaLote(BaseModel):
+    creados: int
+    duplicados: int
+    errores: int
+    resultados: List[ResultadoMedicionLote]
+
 # Lista de métricas válidas
 METRICAS_VALIDAS = [
     'Peso corporal',
@@ -74,41 +113,123 @@ METRICAS_VALIDAS = [
     'Calidad del sueño'
 ]
 
+# Columnas que se pueden pedir con ?fields=
+CAMPOS_METRICA = [
+    'id', 'id_usuario', 'tipo_metrica', 'fecha', 'valor_principal',
+    'categoria', 'detalles', 'created_at', 'updated_at'
+]
+
+# Límite de mediciones por petición en la carga por lote
+MAX_MEDICIONES_LOTE = 10000
+# Límite del cuerpo de la carga por lote, aplicado mientras se lee (2 KB por medición)
+MAX_BYTES_LOTE = MAX_MEDICIONES_LOTE * 2048
+# La clave se guarda como '<clave>:<índice>' en una columna VARCHAR(100)
+MAX_LARGO_CLAVE_IDEMPOTENCIA = 64
+
+# Filtros ?detalle=clave<op>valor, p. ej. cintura>=80 o ejercicio=Sentadilla
+FILTRO_DETALLE_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]{0,49})(!=|>=|<=|=|>|<)(.+)$')
+CLAVE_DETALLE_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,49}$')
+MAX_CLAVES_DETALLE = 10
+
+def codificar_cursor(fecha: date, id_metrica: int) -> str:
+    # str(date) es su forma ISO
+    return base64.urlsafe_b64encode(f"{fecha}|{id_metrica}".encode()).decode()
+
+def decodificar_cursor(cursor: str):
+    try:
+        fecha, id_metrica = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(fecha), int(id_metrica)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def parsear_campos(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    campos = [c.strip() for c in fields.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_METRICA]
+    if invalidos or not campos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(invalidos)}. Deben ser de: {', '.join(CAMPOS_METRICA)}"
+        )
+    return campos
+
+def parsear_filtros_detalle(detalle: Optional[List[str]]) -> list:
+    filtros = []
+    for filtro in detalle or []:
+        match = FILTRO_DETALLE_RE.match(filtro)
+        if not match:
+            raise HTTPException(status_code=400, detail=f"Filtro de detalle inválido: {filtro}")
+        clave, operador, valor = match.groups()
+        try:
+            valor = float(valor)
+        except ValueError:
+            if operador not in ('=', '!='):
+                raise HTTPException(status_code=400, detail=f"El filtro {filtro} requiere un valor numérico")
+        filtros.append((clave, operador, valor))
+    return filtros
+
+def serializar_campo(campo: str, valor):
+    if valor is None:
+        return None
+    if campo == 'valor_principal':
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
 @router.get("/seguimiento-metrica", response_model=List[SeguimientoMetrica])
 async def get_seguimiento_metricas(
+    response: Response,
     tipo_metrica: Optional[str] = None,
     fecha_inicio: Optional[date] = None,
     fecha_fin: Optional[date] = None,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Tamaño de página; sin valor se devuelve todo el historial"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    fields: Optional[str] = Query(None, description="Columnas a devolver separadas por coma, p. ej. fecha,valor_principal"),
+    detalle: Optional[List[str]] = Query(None, description="Filtros sobre claves de detalles, p. ej. cintura>=80; se pueden repetir"),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """
-    Obtiene el historial de mediciones de un usuario.
+    Obtiene el historial de mediciones de un usuario, de la más reciente a la más antigua.
+    Con `limit` pagina por keyset sobre (fecha, id): si hay más resultados, la
+    cabecera X-Next-Cursor trae el cursor de la página siguiente.
+    Con `fields` solo se leen esas columnas y `detalles` se parsea únicamente si se pide.
+    Los filtros `detalle` se evalúan en MySQL sobre la columna JSON.
     """
     try:
-        query = text("""
-            SELECT * FROM seguimiento_metrica 
-            WHERE id_usuario = :id_usuario
-        """)
-        params = {"id_usuario": current_user.id}
-
-        if tipo_metrica:
-            query = text(str(query) + " AND tipo_metrica = :tipo_metrica")
-            params["tipo_metrica"] = tipo_metrica
-
-        if fecha_inicio:
-            query = text(str(query) + " AND fecha >= :fecha_inicio")
-            params["fecha_inicio"] = fecha_inicio
-
-        if fecha_fin:
-            query = text(str(query) + " AND fecha <= :fecha_fin")
-            params["fecha_fin"] = fecha_fin
-
-        query = text(str(query) + " ORDER BY fecha DESC")
-        
-        result = db.execute(query, params)
-        metricas = result.fetchall()
-        
+        campos = parsear_campos(fields)
+        # fecha e id siempre se leen: son la clave del cursor
+        columnas = CAMPOS_METRICA if campos is None else list(dict.fromkeys(campos + ['fecha', 'id']))
+
+        # Una fila extra indica si existe una página siguiente
+        metricas = await listar_mediciones_async(
+            db,
+            current_user.id,
+            columnas,
+            tipo_metrica=tipo_metrica,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            cursor=decodificar_cursor(cursor) if cursor else None,
+            limite=limit + 1 if limit else None,
+            filtros_detalle=parsear_filtros_detalle(detalle)
+        )
+
+        if limit and len(metricas) > limit:
+            metricas = metricas[:limit]
+            response.headers["X-Next-Cursor"] = codificar_cursor(metricas[-1].fecha, metricas[-1].id)
+
+        if campos is not None:
+            # Proyección: se responde directamente, sin construir modelos Pydantic
+            return JSONResponse(
+                content=[
+                    {campo: serializar_campo(campo, getattr(row, campo)) for campo in campos}
+                    for row in metricas
+                ],
+                headers=dict(response.headers)
+            )
+
         return [
             SeguimientoMetrica(
                 id=row.id,
@@ -117,17 +238,124 @@ async def get_seguimiento_metricas(
                 fecha=row.fecha,
                 valor_principal=float(row.valor_principal),
                 categoria=row.categoria,
-                detalles=json.loads(row.detalles) if row.detalles else None,
+                detalles=row.detalles,
                 created_at=row.created_at,
                 updated_at=row.updated_at
             )
             for row in metricas
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error al obtener métricas: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/seguimiento-metrica/detalles")
+async def get_resumen_detalles(
+    tipo_metrica: str,
+    claves: str = Query(..., description="Claves numéricas de detalles separadas por coma, p. ej. cintura,cadera"),
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Agrega claves numéricas de `detalles` de una métrica (p. ej. cintura y
+    cadera en 'Relación cintura-cadera (WHR)') sin leer las mediciones:
+    cantidad, promedio, mínimo y máximo por clave, calculados en MySQL.
+    """
+    try:
+        if tipo_metrica not in METRICAS_VALIDAS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tipo de métrica inválido. Debe ser uno de: {', '.join(METRICAS_VALIDAS)}"
+            )
+        lista_claves = list(dict.fromkeys(c.strip() for c in claves.split(",") if c.strip()))
+        if not lista_claves or len(lista_claves) > MAX_CLAVES_DETALLE or not all(CLAVE_DETALLE_RE.match(c) for c in lista_claves):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Se requieren entre 1 y {MAX_CLAVES_DETALLE} claves alfanuméricas"
+            )
+
+        resumen = await resumir_detalles_async(
+            db, current_user.id, tipo_metrica, lista_claves, fecha_inicio, fecha_fin
+        )
+        return {"tipo_metrica": tipo_metrica, **resumen}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al resumir los detalles de métricas: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/seguimiento-metrica/series", response_model=SerieMetrica)
+async def get_serie_metrica(
+    tipo_metrica: str,
+    intervalo: Literal['dia', 'semana', 'mes'] = 'semana',
+    ventana: int = Query(4, ge=1, le=52, description="Intervalos que promedia la media móvil"),
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Serie agregada de una métrica para los gráficos de progreso.
+    Se lee de Seguimiento_Metrica_Resumen, de modo que el costo depende del
+    número de días o semanas con mediciones y no del número de mediciones:
+    las semanas sin rango de fechas usan el resumen semanal, el resto se
+    agrupa a partir del diario.
+    La pendiente (unidades por día) es la de mínimos cuadrados sobre todas las
+    mediciones, calculada a partir de las sumas parciales de cada periodo.
+    """
+    try:
+        if tipo_metrica not in METRICAS_VALIDAS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tipo de métrica inválido. Debe ser uno de: {', '.join(METRICAS_VALIDAS)}"
+            )
+
+        result = await db.execute(serie_stmt(current_user.id, tipo_metrica, intervalo, fecha_inicio, fecha_fin))
+        filas = result.all()
+
+        promedios = [float(row.promedio) for row in filas]
+        medias = medias_moviles(promedios, ventana)
+
+        pendiente = None
+        if filas:
+            pendiente = pendiente_minimos_cuadrados(
+                sum(row.mediciones for row in filas),
+                sum(row.suma_x for row in filas),
+                sum(row.suma_y for row in filas),
+                sum(row.suma_xy for row in filas),
+                sum(row.suma_xx for row in filas)
+            )
+
+        return SerieMetrica(
+            tipo_metrica=tipo_metrica,
+            intervalo=intervalo,
+            ventana=ventana,
+            pendiente_por_dia=pendiente,
+            puntos=[
+                PuntoSerie(
+                    inicio=row.periodo,
+                    mediciones=row.mediciones,
+                    promedio=round(promedio, 4),
+                    minimo=float(row.minimo),
+                    maximo=float(row.maximo),
+                    ultimo=float(row.ultimo),
+                    media_movil=media
+                )
+                for row, promedio, media in zip(filas, promedios, medias)
+            ]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al obtener la serie de métricas: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/seguimiento-metrica", response_model=SeguimientoMetrica)
 async def create_seguimiento_metrica(
     metrica: SeguimientoMetricaCreate,
@@ -145,110 +373,169 @@ async def create_seguimiento_metrica(
                 detail=f"Tipo de métrica inválido. Debe ser uno de: {', '.join(METRICAS_VALIDAS)}"
             )
 
-        # Preparar detalles como JSON
-        detalles_json = json.dumps(metrica.detalles) if metrica.detalles else None
-
-        # Insertar nueva métrica
-        query = text("""
-            INSERT INTO seguimiento_metrica 
-            (id_usuario, tipo_metrica, fecha, valor_principal, categoria, detalles)
-            VALUES (:id_usuario, :tipo_metrica, :fecha, :valor_principal, :categoria, :detalles)
-        """)
-        
-        db.execute(
-            query,
-            {
-                "id_usuario": current_user.id,
-                "tipo_metrica": metrica.tipo_metrica,
-                "fecha": metrica.fecha,
-                "valor_principal": metrica.valor_principal,
-                "categoria": metrica.categoria,
-                "detalles": detalles_json
-            }
-        )
-        db.commit()
-
-        # Obtener el registro recién insertado
-        get_query = text("""
-            SELECT * FROM seguimiento_metrica 
-            WHERE id_usuario = :id_usuario 
-            AND tipo_metrica = :tipo_metrica 
-            AND fecha = :fecha 
-            ORDER BY id DESC 
-            LIMIT 1
-        """)
-        
-        result = db.execute(
-            get_query,
-            {
-                "id_usuario": current_user.id,
-                "tipo_metrica": metrica.tipo_metrica,
-                "fecha": metrica.fecha
-            }
-        )
-        
-        new_metrica = result.fetchone()
-        return SeguimientoMetrica(
-            id=new_metrica.id,
-            id_usuario=new_metrica.id_usuario,
-            tipo_metrica=new_metrica.tipo_metrica,
-            fecha=new_metrica.fecha,
-            valor_principal=float(new_metrica.valor_principal),
-            categoria=new_metrica.categoria,
-            detalles=json.loads(new_metrica.detalles) if new_metrica.detalles else None,
-            created_at=new_metrica.created_at,
-            updated_at=new_metrica.updated_at
-        )
+        nueva = crear_medicion(db, current_user.id, metrica.dict())
+        return SeguimientoMetrica(**nueva)
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error al crear métrica: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+def error_lote_grande() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Máximo {MAX_MEDICIONES_LOTE} mediciones o {MAX_BYTES_LOTE} bytes por petición"
+    )
+
+async def leer_cuerpo_lote(request: Request) -> bytes:
+    """
+    Lee el cuerpo de la carga por lote cortando con 413 en cuanto supera
+    MAX_BYTES_LOTE, sin acumular primero el cuerpo completo en memoria.
+    """
+    largo = request.headers.get("content-length")
+    if largo is not None and largo.isdigit() and int(largo) > MAX_BYTES_LOTE:
+        raise error_lote_grande()
+
+    partes = []
+    leidos = 0
+    async for parte in request.stream():
+        leidos += len(parte)
+        if leidos > MAX_BYTES_LOTE:
+            raise error_lote_grande()
+        partes.append(parte)
+    return b"".join(partes)
+
+def leer_items_lote(cuerpo: bytes, content_type: str) -> list:
+    """
+    Items del cuerpo de la carga por lote: un arreglo JSON o NDJSON (un objeto
+    por línea). Una línea NDJSON inválida se devuelve como excepción para
+    reportarla en su posición sin descartar el resto. Más de
+    MAX_MEDICIONES_LOTE items responde 413; en NDJSON sin parsear el resto.
+    """
+    if "ndjson" in content_type:
+        items = []
+        for linea in cuerpo.decode("utf-8").splitlines():
+            if not linea.strip():
+                continue
+            if len(items) == MAX_MEDICIONES_LOTE:
+                raise error_lote_grande()
+            try:
+                items.append(orjson.loads(linea))
+            except ValueError as e:
+                items.append(e)
+        return items
+
+    try:
+        items = orjson.loads(cuerpo)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="El cuerpo debe ser un arreglo JSON o NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="El cuerpo debe ser un arreglo JSON o NDJSON")
+    if len(items) > MAX_MEDICIONES_LOTE:
+        raise error_lote_grande()
+    return items
+
+@router.post("/seguimiento-metrica/batch", response_model=RespuestaLote)
+async def create_seguimiento_metricas_lote(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Registra muchas mediciones en una petición, p. ej. la exportación de un wearable.
+    Acepta un arreglo JSON o NDJSON (Content-Type: application/x-ndjson) de
+    SeguimientoMetricaCreate. Se validan todas antes de escribir y las válidas
+    se insertan en lotes multi-fila, con un commit por lote.
+
+    Con la cabecera Idempotency-Key cada medición queda identificada por
+    '<clave>:<índice>': reintentar la misma petición no duplica mediciones y
+    devuelve los ids ya creados con estado 'duplicado'.
+    """
+    try:
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_LARGO_CLAVE_IDEMPOTENCIA:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key debe tener entre 1 y {MAX_LARGO_CLAVE_IDEMPOTENCIA} caracteres"
+            )
+
+        items = leer_items_lote(await leer_cuerpo_lote(request), request.headers.get("content-type", ""))
+
+        # Sin clave del cliente se usa una propia de la petición: no protege
+        # reintentos, pero permite recuperar el id de cada fila insertada
+        prefijo = idempotency_key or uuid.uuid4().hex
+        resultados: List[Optional[ResultadoMedicionLote]] = [None] * len(items)
+        validas = []
+        indices_validas = []
+        for indice, item in enumerate(items):
+            if isinstance(item, Exception):
+                resultados[indice] = ResultadoMedicionLote(indice=indice, estado="error", error=f"JSON inválido: {item}")
+                continue
+            try:
+                metrica = SeguimientoMetricaCreate.parse_obj(item)
+            except ValidationError as e:
+                resultados[indice] = ResultadoMedicionLote(
+                    indice=indice,
+                    estado="error",
+                    error="; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                )
+                continue
+            if metrica.tipo_metrica not in METRICAS_VALIDAS:
+                resultados[indice] = ResultadoMedicionLote(indice=indice, estado="error", error="Tipo de métrica inválido")
+                continue
+            validas.append({**metrica.dict(), "clave_idempotencia": f"{prefijo}:{indice}"})
+            indices_validas.append(indice)
+
+        if validas:
+            insertadas = await run_in_threadpool(insertar_mediciones_lote, db, current_user.id, validas)
+            for indice, resultado in zip(indices_validas, insertadas):
+                resultados[indice] = ResultadoMedicionLote(indice=indice, **resultado)
+
+        estados = [r.estado for r in resultados]
+        return RespuestaLote(
+            creados=estados.count("creado"),
+            duplicados=estados.count("duplicado"),
+            errores=estados.count("error"),
+            resultados=resultados
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error al registrar el lote de métricas: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/seguimiento-metrica/delete")
 async def delete_seguimiento_metrica(
-    id_metrica: int,
+    id_metrica: Optional[int] = None,
+    metrica: Optional[SeguimientoMetricaDelete] = None,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
     Elimina una medición de métrica.
+    Acepta el id como parámetro `id_metrica` o un cuerpo SeguimientoMetricaDelete;
+    con el cuerpo, tipo_metrica y fecha evitan leer la fila antes de borrarla.
     """
     try:
-        # Verificar que la métrica pertenece al usuario
-        query = text("""
-            SELECT id FROM seguimiento_metrica 
-            WHERE id = :id_metrica AND id_usuario = :id_usuario
-        """)
-        result = db.execute(
-            query,
-            {
-                "id_metrica": id_metrica,
-                "id_usuario": current_user.id
-            }
-        )
-        
-        if not result.fetchone():
+        if metrica is not None:
+            eliminada = eliminar_medicion(db, current_user.id, metrica.id, metrica.tipo_metrica, metrica.fecha)
+        elif id_metrica is not None:
+            eliminada = eliminar_medicion(db, current_user.id, id_metrica)
+        else:
+            raise HTTPException(status_code=400, detail="Se requiere id_metrica o un cuerpo con id, tipo_metrica y fecha")
+
+        if not eliminada:
             raise HTTPException(
                 status_code=404,
                 detail="Métrica no encontrada o no tienes permiso para eliminarla"
             )
 
-        # Eliminar la métrica
-        delete_query = text("""
-            DELETE FROM seguimiento_metrica 
-            WHERE id = :id_metrica AND id_usuario = :id_usuario
-        """)
-        db.execute(
-            delete_query,
-            {
-                "id_metrica": id_metrica,
-                "id_usuario": current_user.id
-            }
-        )
-        db.commit()
-        
         return {"message": "Métrica eliminada correctamente"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error al eliminar métrica: {str(e)}")
@@ -7,6 +7,9 @@ from app.models import models_auto as models
 from ..models.base import User
 from ..schemas import survey as schemas
 from app.auth import get_current_user
+from app.crud.perfil_usuario import calcular_encuesta_completa
+from app.crud.metricas_salud import actualizar_metricas_salud
+from app.crud.encuesta import actualizar_seccion_encuesta, guardar_filas_encuesta, invalidar_datos_encuesta
 from sqlalchemy.sql import func
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -71,135 +74,27 @@ async def complete_survey(
             db.flush()
             logger.info("Perfil de usuario actualizado exitosamente")
 
-        # 2. Limpiar datos anteriores
-        logger.info("Limpiando datos anteriores")
-        db.query(models.PreferenciasAlimentarias).filter(
-            models.PreferenciasAlimentarias.id_perfil == perfil.id
-        ).delete()
-        db.query(models.AlimentosEvitados).filter(
-            models.AlimentosEvitados.id_perfil == perfil.id
-        ).delete()
-        db.query(models.CondicionFisica).filter(
-            models.CondicionFisica.id_perfil == perfil.id
-        ).delete()
-        db.query(models.EjercicioPreferido).filter(
-            models.EjercicioPreferido.id_perfil == perfil.id
-        ).delete()
-        db.query(models.EquipamientoDisponible).filter(
-            models.EquipamientoDisponible.id_perfil == perfil.id
-        ).delete()
-        db.query(models.HistorialMedico).filter(
-            models.HistorialMedico.id_perfil == perfil.id
-        ).delete()
-        db.query(models.HabitosDiarios).filter(
-            models.HabitosDiarios.id_perfil == perfil.id
-        ).delete()
+        # 2. Llevar las secciones al estado enviado escribiendo solo lo que cambió
+        logger.info("Comparando secciones de la encuesta con los datos guardados")
+        cambios = guardar_filas_encuesta(db, perfil.id, survey_data)
+        for tabla, conteo in cambios.items():
+            logger.info(
+                f"{tabla}: {conteo['borradas']} borradas, {conteo['insertadas']} insertadas, "
+                f"{conteo['actualizadas']} actualizadas"
+            )
+        if not cambios:
+            logger.info("Las secciones de la encuesta no cambiaron")
+
+        # 3. Actualizar el estado de la encuesta que lee /me/survey-status
         db.flush()
-        logger.info("Datos anteriores limpiados exitosamente")
+        perfil.encuesta_completa = calcular_encuesta_completa(db, current_user.id)
 
-        # 3. Guardar preferencias alimentarias
-        logger.info("Guardando preferencias alimentarias")
-        
-        # Guardar tipo de dieta
-        for tipo in survey_data.foodPreferences.tipoDieta:
-            preferencia = models.PreferenciasAlimentarias(
-                id_perfil=perfil.id,
-                tipo='dieta',
-                valor=tipo
-            )
-            db.add(preferencia)
-            logger.info(f"Agregada preferencia de dieta: {tipo}")
-
-        # Guardar alergias
-        for alergia in survey_data.foodPreferences.alergias:
-            preferencia = models.PreferenciasAlimentarias(
-                id_perfil=perfil.id,
-                tipo='alergia',
-                valor=alergia,
-                otros_alergias=survey_data.foodPreferences.otrosAlergias if alergia == 'Otro' else None
-            )
-            db.add(preferencia)
-            logger.info(f"Agregada alergia: {alergia}")
-
-        # Guardar alimentos favoritos
-        for favorito in survey_data.foodPreferences.alimentosFavoritos:
-            preferencia = models.PreferenciasAlimentarias(
-                id_perfil=perfil.id,
-                tipo='favorito',
-                valor=favorito,
-                otros_alimentos_favoritos=survey_data.foodPreferences.otrosAlimentosFavoritos if favorito == 'Otros' else None
-            )
-            db.add(preferencia)
-            logger.info(f"Agregado alimento favorito: {favorito}")
-
-        # 4. Guardar alimentos evitados
-        for alimento in survey_data.foodPreferences.alimentosEvitados:
-            alimentos_evitados = models.AlimentosEvitados(
-                id_perfil=perfil.id,
-                descripcion=alimento
-            )
-            db.add(alimentos_evitados)
-            logger.info(f"Agregado alimento evitado: {alimento}")
-
-        # 5. Guardar condición física
-        logger.info("Guardando condición física")
-        condicion = models.CondicionFisica(
-            id_perfil=perfil.id,
-            frecuencia_ejercicio=survey_data.physicalCondition.frecuenciaEjercicio,
-            tiempo_disponible=survey_data.physicalCondition.tiempoDisponible
-        )
-        db.add(condicion)
-        logger.info("Condición física guardada exitosamente")
-
-        # 6. Guardar ejercicios preferidos
-        for ejercicio in survey_data.physicalCondition.ejerciciosPreferidos:
-            ejercicio_pref = models.EjercicioPreferido(
-                id_perfil=perfil.id,
-                tipo=ejercicio
-            )
-            db.add(ejercicio_pref)
-            logger.info(f"Agregado ejercicio preferido: {ejercicio}")
-
-        # 7. Guardar equipamiento disponible
-        for equipo in survey_data.physicalCondition.equipamientoDisponible:
-            equipamiento = models.EquipamientoDisponible(
-                id_perfil=perfil.id,
-                equipo=equipo
-            )
-            db.add(equipamiento)
-            logger.info(f"Agregado equipamiento: {equipo}")
-
-        # 8. Guardar historial médico
-        logger.info("Guardando historial médico")
-        historial = models.HistorialMedico(
-            id_perfil=perfil.id,
-            condicion_cronica=survey_data.medicalHistory.condicionCronica,
-            otras_condiciones=survey_data.medicalHistory.otrasCondiciones,
-            medicamentos=survey_data.medicalHistory.medicamentos,
-            lesiones=survey_data.medicalHistory.lesiones,
-            antecedentes_familiares=survey_data.medicalHistory.antecedentesFamiliares
-        )
-        db.add(historial)
-        logger.info("Historial médico guardado exitosamente")
-
-        # 9. Guardar hábitos diarios
-        logger.info("Guardando hábitos diarios")
-        habitos = models.HabitosDiarios(
-            id_perfil=perfil.id,
-            horas_sueno=survey_data.dailyHabits.horasSueno,
-            calidad_sueno=survey_data.dailyHabits.calidadSueno,
-            nivel_estres=survey_data.dailyHabits.nivelEstres,
-            agua_dia=survey_data.dailyHabits.aguaDia,
-            comidas_dia=survey_data.dailyHabits.comidasDia,
-            habitos_snack=survey_data.dailyHabits.habitosSnack,
-            horas_pantalla=survey_data.dailyHabits.horasPantalla,
-            tipo_trabajo=survey_data.dailyHabits.tipoTrabajo
-        )
-        db.add(habitos)
-        logger.info("Hábitos diarios guardados exitosamente")
+        # 4. Recalcular las métricas de salud que lee /usuarios/me/health-metrics
+        actualizar_metricas_salud(db, current_user.id)
 
         # Confirmar todos los cambios
         db.commit()
+        invalidar_datos_encuesta(current_user.id)
         logger.info("Todos los cambios guardados exitosamente")
 
         return {
@@ -214,4 +109,78 @@ async def complete_survey(
         raise HTTPException(
             status_code=500,
             detail=f"Error al guardar la encuesta: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+def _actualizar_seccion(db: Session, current_user: User, seccion: str, datos) -> dict:
+    """
+    Guarda una sección de la encuesta en una transacción corta que solo toca
+    sus tablas. La encuesta debe haberse completado antes (requiere perfil).
+    """
+    try:
+        logger.info(f"Actualizando sección {seccion} de la encuesta del usuario {current_user.id}")
+        cambios = actualizar_seccion_encuesta(db, current_user.id, seccion, datos)
+        if cambios is None:
+            raise HTTPException(status_code=404, detail="Perfil no encontrado")
+
+        invalidar_datos_encuesta(current_user.id)
+        logger.info(f"Sección {seccion} guardada: {cambios or 'sin cambios'}")
+        return {
+            "message": "Sección de la encuesta actualizada exitosamente",
+            "seccion": seccion,
+            "cambios": cambios
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al actualizar la sección {seccion}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al actualizar la encuesta: {str(e)}"
+        )
+
+@router.patch("/survey/personal-info", response_model=dict)
+async def update_personal_info(
+    datos: schemas.PersonalInfo,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return _actualizar_seccion(db, current_user, "personalInfo", datos)
+
+@router.patch("/survey/food-preferences", response_model=dict)
+async def update_food_preferences(
+    datos: schemas.FoodPreferences,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return _actualizar_seccion(db, current_user, "foodPreferences", datos)
+
+@router.patch("/survey/physical-condition", response_model=dict)
+async def update_physical_condition(
+    datos: schemas.PhysicalCondition,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return _actualizar_seccion(db, current_user, "physicalCondition", datos)
+
+@router.patch("/survey/medical-history", response_model=dict)
+async def update_medical_history(
+    datos: schemas.MedicalHistory,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return _actualizar_seccion(db, current_user, "medicalHistory", datos)
+
+@router.patch("/survey/daily-habits", response_model=dict)
+async def update_daily_habits(
+    datos: schemas.DailyHabits,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return _actualizar_seccion(db, current_user, "dailyHabits", datos)
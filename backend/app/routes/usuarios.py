@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, Security
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Security
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas import UsuarioCreate, UsuarioOut, UsuarioLogin
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.crud.usuario import crear_usuario, get_usuario_por_correo
 from app.models import models_auto as models
 from passlib.hash import bcrypt
@@ -13,7 +14,10 @@ from decimal import Decimal
 from ..models.base import User
 from app.schemas.usuario import UsuarioCreate, UsuarioOut
 from app.crud import usuario as crud_usuario
-from typing import List
+from app.crud.perfil_usuario import obtener_encuesta_completa
+from app.crud.metricas_salud import etag_metricas, obtener_metricas_salud_async, respuesta_metricas
+from app.utils.respuestas import RespuestaJSONRapida, etag_coincide
+from typing import List, Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 # Configurar logging
@@ -107,77 +111,19 @@ async def get_current_user_data(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Error al obtener datos del usuario")
 
 @router.get("/me/survey-status")
-async def get_survey_status(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_survey_status(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
-        logger.info(f"Verificando estado de encuesta para usuario: {current_user.email}")
-        perfil = db.query(models.PerfilUsuario).filter(
-            models.PerfilUsuario.id_usuario == current_user.id
-        ).first()
-        
-        logger.info(f"Perfil encontrado: {perfil is not None}")
-        
-        if not perfil:
-            logger.info("No se encontró perfil para el usuario")
+        # Flag encuesta_completa del perfil; se calcula con una consulta agregada si aún no existe
+        completed = await obtener_encuesta_completa(db, current_user.id)
+
+        if completed is None:
+            logger.debug(f"No se encontró perfil para el usuario {current_user.id}")
             return {"completed": False, "last_updated": None}
-            
-        # Verificar si tiene datos básicos del perfil
-        has_basic_info = all([
-            perfil.genero is not None and perfil.genero != '',
-            perfil.edad is not None and perfil.edad > 0,
-            perfil.peso is not None and perfil.peso > 0,
-            perfil.altura is not None and perfil.altura > 0,
-            perfil.nivel_actividad is not None and perfil.nivel_actividad != '',
-            perfil.objetivo_principal is not None and perfil.objetivo_principal != '',
-            perfil.tiempo_meta is not None and perfil.tiempo_meta != '',
-            perfil.nivel_compromiso is not None and perfil.nivel_compromiso > 0
-        ])
-        logger.info(f"Tiene información básica: {has_basic_info}")
-        logger.info(f"Detalles de información básica: genero={perfil.genero}, edad={perfil.edad}, peso={perfil.peso}, altura={perfil.altura}, nivel_actividad={perfil.nivel_actividad}, objetivo_principal={perfil.objetivo_principal}, tiempo_meta={perfil.tiempo_meta}, nivel_compromiso={perfil.nivel_compromiso}")
-        
-        # Verificar si tiene preferencias alimentarias
-        has_food_preferences = db.query(models.PreferenciasAlimentarias).filter(
-            models.PreferenciasAlimentarias.id_perfil == perfil.id
-        ).first() is not None
-        logger.info(f"Tiene preferencias alimentarias: {has_food_preferences}")
-        
-        # Verificar si tiene condición física
-        has_fitness = db.query(models.CondicionFisica).filter(
-            models.CondicionFisica.id_perfil == perfil.id
-        ).first() is not None
-        logger.info(f"Tiene condición física: {has_fitness}")
-        
-        # Verificar si tiene hábitos diarios
-        has_habits = db.query(models.HabitosDiarios).filter(
-            models.HabitosDiarios.id_perfil == perfil.id
-        ).first() is not None
-        logger.info(f"Tiene hábitos diarios: {has_habits}")
-        
-        # Verificar si tiene ejercicios preferidos
-        has_exercises = db.query(models.EjercicioPreferido).filter(
-            models.EjercicioPreferido.id_perfil == perfil.id
-        ).first() is not None
-        logger.info(f"Tiene ejercicios preferidos: {has_exercises}")
-        
-        # Verificar si tiene equipamiento
-        has_equipment = db.query(models.EquipamientoDisponible).filter(
-            models.EquipamientoDisponible.id_perfil == perfil.id
-        ).first() is not None
-        logger.info(f"Tiene equipamiento: {has_equipment}")
-        
-        completed = all([
-            has_basic_info,
-            has_food_preferences,
-            has_fitness,
-            has_habits,
-            has_exercises,
-            has_equipment
-        ])
-        logger.info(f"Estado final de la encuesta: completed={completed}")
-        logger.info(f"Detalles de verificación: basic_info={has_basic_info}, food_preferences={has_food_preferences}, fitness={has_fitness}, habits={has_habits}, exercises={has_exercises}, equipment={has_equipment}")
-        
+
+        logger.debug(f"Estado de la encuesta para usuario {current_user.id}: completed={completed}")
         return {
             "completed": completed,
-            "last_updated": perfil.updated_at.isoformat() if hasattr(perfil, 'updated_at') and perfil.updated_at else None
+            "last_updated": None
         }
         
     except Exception as e:
@@ -189,39 +135,37 @@ async def get_survey_status(current_user: User = Depends(get_current_user), db:
         )
 
 @router.get("/me/health-metrics")
-async def get_health_metrics(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_health_metrics(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Métricas de salud precalculadas del perfil. Se responde con un ETag: si el
+    cliente envía el mismo en If-None-Match se responde 304 sin cuerpo.
+    """
     try:
         logger.info(f"Obteniendo métricas de salud para usuario: {current_user.email}")
-        perfil = db.query(models.PerfilUsuario).filter(
-            models.PerfilUsuario.id_usuario == current_user.id
-        ).first()
-        
-        if not perfil:
+        tiene_perfil, metricas = await obtener_metricas_salud_async(db, current_user.id)
+
+        if not tiene_perfil:
             raise HTTPException(
                 status_code=404,
                 detail="No se encontró el perfil del usuario"
             )
-            
-        if not all([perfil.edad, perfil.genero, perfil.peso, perfil.altura]):
+
+        if metricas is None:
             raise HTTPException(
                 status_code=400,
                 detail="Faltan datos necesarios para calcular las métricas de salud"
             )
-            
-        metrics = calculate_all_metrics(
-            edad=perfil.edad,
-            genero=perfil.genero,
-            peso=perfil.peso,
-            altura=perfil.altura
-        )
-        
-        return {
-            "tmb": metrics["tmb"],
-            "peso_ideal": metrics["peso_ideal"],
-            "frecuencia_cardiaca_maxima": metrics["frecuencia_cardiaca_maxima"],
-            "peso_actual": float(perfil.peso),
-            "diferencia_peso": round(float(perfil.peso) - metrics["peso_ideal"], 2)
-        }
+
+        # no-cache: el cliente puede guardar la respuesta pero debe revalidarla
+        cabeceras = {"ETag": f'"{etag_metricas(metricas)}"', "Cache-Control": "private, no-cache"}
+        if if_none_match and etag_coincide(if_none_match, cabeceras["ETag"]):
+            return Response(status_code=304, headers=cabeceras)
+
+        return RespuestaJSONRapida(respuesta_metricas(metricas), headers=cabeceras)
         
     except HTTPException as he:
         raise he
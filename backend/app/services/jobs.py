@@ -0,0 +1,244 @@
+"""
+Cola de trabajos para la generación de planes de comidas y entrenamiento.
+
+Los trabajos se guardan en la tabla Trabajo_Generacion, por lo que sobreviven a
+un reinicio del servidor sin necesitar un broker externo. Cada proceso de
+uvicorn arranca PLAN_JOB_WORKERS tareas que reclaman trabajos pendientes con
+SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import models_auto as models
+from app.services.plan_generation import generar_plan_comidas, generar_plan_entrenamiento
+
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno
+load_dotenv()
+
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_POLL_SECONDS = float(os.getenv("PLAN_JOB_POLL_SECONDS", "2"))
+# Mientras se ejecuta, un trabajo renueva 'actualizado' cada PLAN_JOB_HEARTBEAT_SECONDS
+PLAN_JOB_HEARTBEAT_SECONDS = float(os.getenv("PLAN_JOB_HEARTBEAT_SECONDS", "30"))
+# Un trabajo 'en_proceso' sin latido durante este tiempo se considera interrumpido
+PLAN_JOB_STALE_SECONDS = int(os.getenv("PLAN_JOB_STALE_SECONDS", str(int(4 * PLAN_JOB_HEARTBEAT_SECONDS))))
+PLAN_JOB_MAX_INTENTOS = int(os.getenv("PLAN_JOB_MAX_INTENTOS", "3"))
+
+GENERADORES = {
+    "comidas": generar_plan_comidas,
+    "entrenamiento": generar_plan_entrenamiento,
+}
+ESTADOS_FINALES = ("completado", "error")
+
+_despertar = asyncio.Event()
+_tareas = []
+_activo = False
+
+
+def _clave_activa(id_usuario: int, tipo: str) -> str:
+    return f"{id_usuario}:{tipo}"
+
+
+def serializar_trabajo(trabajo: models.TrabajoGeneracion) -> dict:
+    return {
+        "id": trabajo.id,
+        "tipo": trabajo.tipo,
+        "estado": trabajo.estado,
+        "intentos": trabajo.intentos,
+        "resultado": json.loads(trabajo.resultado) if trabajo.resultado else None,
+        "error": trabajo.error,
+        "creado": trabajo.creado.isoformat() if trabajo.creado else None,
+        "actualizado": trabajo.actualizado.isoformat() if trabajo.actualizado else None
+    }
+
+
+def encolar_trabajo(db: Session, id_usuario: int, tipo: str) -> models.TrabajoGeneracion:
+    """
+    Encola una generación para el usuario. Si ya hay un trabajo activo del
+    mismo tipo para ese usuario se devuelve ese en lugar de crear otro.
+    """
+    clave = _clave_activa(id_usuario, tipo)
+    existente = db.query(models.TrabajoGeneracion).filter(
+        models.TrabajoGeneracion.clave_activa == clave
+    ).first()
+    if existente:
+        return existente
+
+    trabajo = models.TrabajoGeneracion(
+        id_usuario=id_usuario,
+        tipo=tipo,
+        estado="pendiente",
+        clave_activa=clave,
+        intentos=0
+    )
+    db.add(trabajo)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otra petición encoló el mismo trabajo entre la consulta y el INSERT
+        db.rollback()
+        return db.query(models.TrabajoGeneracion).filter(
+            models.TrabajoGeneracion.clave_activa == clave
+        ).first()
+    db.refresh(trabajo)
+
+    _despertar.set()
+    return trabajo
+
+
+def obtener_trabajo(db: Session, id_trabajo: int, id_usuario: int) -> Optional[models.TrabajoGeneracion]:
+    return db.query(models.TrabajoGeneracion).filter(
+        models.TrabajoGeneracion.id == id_trabajo,
+        models.TrabajoGeneracion.id_usuario == id_usuario
+    ).first()
+
+
+def recuperar_trabajos_interrumpidos() -> int:
+    """
+    Devuelve a 'pendiente' los trabajos que quedaron 'en_proceso' por un
+    reinicio, o los marca como error si ya agotaron sus intentos. Un trabajo
+    en ejecución renueva 'actualizado' con cada latido, así que solo se
+    reclaman los que llevan PLAN_JOB_STALE_SECONDS sin latir.
+    """
+    limite = datetime.now() - timedelta(seconds=PLAN_JOB_STALE_SECONDS)
+    with SessionLocal() as db:
+        interrumpidos = db.query(models.TrabajoGeneracion).filter(
+            models.TrabajoGeneracion.estado == "en_proceso",
+            models.TrabajoGeneracion.actualizado < limite
+        ).all()
+        for trabajo in interrumpidos:
+            if trabajo.intentos >= PLAN_JOB_MAX_INTENTOS:
+                trabajo.estado = "error"
+                trabajo.error = "El trabajo se interrumpió demasiadas veces"
+                trabajo.clave_activa = None
+            else:
+                trabajo.estado = "pendiente"
+        db.commit()
+        return len(interrumpidos)
+
+
+def _reclamar_siguiente() -> Optional[Tuple[int, int, str]]:
+    with SessionLocal() as db:
+        trabajo = db.query(models.TrabajoGeneracion).filter(
+            models.TrabajoGeneracion.estado == "pendiente"
+        ).order_by(models.TrabajoGeneracion.id).with_for_update(skip_locked=True).first()
+        if not trabajo:
+            return None
+        trabajo.estado = "en_proceso"
+        trabajo.intentos += 1
+        db.commit()
+        return trabajo.id, trabajo.id_usuario, trabajo.tipo
+
+
+def _finalizar(id_trabajo: int, estado: str, resultado: Optional[dict] = None, error: Optional[str] = None) -> None:
+    with SessionLocal() as db:
+        db.query(models.TrabajoGeneracion).filter(
+            models.TrabajoGeneracion.id == id_trabajo
+        ).update({
+            models.TrabajoGeneracion.estado: estado,
+            models.TrabajoGeneracion.resultado: json.dumps(resultado) if resultado is not None else None,
+            models.TrabajoGeneracion.error: error,
+            models.TrabajoGeneracion.clave_activa: None,
+            models.TrabajoGeneracion.actualizado: datetime.now()
+        }, synchronize_session=False)
+        db.commit()
+
+
+def _latir(id_trabajo: int) -> None:
+    with SessionLocal() as db:
+        db.query(models.TrabajoGeneracion).filter(
+            models.TrabajoGeneracion.id == id_trabajo,
+            models.TrabajoGeneracion.estado == "en_proceso"
+        ).update({
+            models.TrabajoGeneracion.actualizado: datetime.now()
+        }, synchronize_session=False)
+        db.commit()
+
+
+async def _latido(id_trabajo: int) -> None:
+    """
+    Renueva 'actualizado' mientras el trabajo se ejecuta, para que otro proceso
+    no lo reclame como interrumpido.
+    """
+    while True:
+        await asyncio.sleep(PLAN_JOB_HEARTBEAT_SECONDS)
+        try:
+            await run_in_threadpool(_latir, id_trabajo)
+        except Exception as e:
+            logger.error(f"Error en el latido del trabajo {id_trabajo}: {str(e)}")
+
+
+async def _ejecutar(id_trabajo: int, id_usuario: int, tipo: str) -> None:
+    logger.info(f"Ejecutando trabajo {id_trabajo} ({tipo}) para usuario {id_usuario}")
+    latido = asyncio.create_task(_latido(id_trabajo))
+    try:
+        resultado = await GENERADORES[tipo](id_usuario)
+    except Exception as e:
+        detalle = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Error en el trabajo {id_trabajo}: {detalle}")
+        await run_in_threadpool(_finalizar, id_trabajo, "error", None, detalle)
+        return
+    finally:
+        latido.cancel()
+    await run_in_threadpool(_finalizar, id_trabajo, "completado", resultado)
+
+
+async def _worker(numero: int) -> None:
+    while _activo:
+        try:
+            reclamado = await run_in_threadpool(_reclamar_siguiente)
+        except Exception as e:
+            logger.error(f"Worker {numero}: error al reclamar trabajo: {str(e)}")
+            reclamado = None
+
+        if reclamado is None:
+            try:
+                await asyncio.wait_for(_despertar.wait(), timeout=PLAN_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                # En reposo, el primer worker revisa trabajos abandonados por otros procesos
+                if numero == 0:
+                    try:
+                        await run_in_threadpool(recuperar_trabajos_interrumpidos)
+                    except Exception as e:
+                        logger.error(f"Error al recuperar trabajos interrumpidos: {str(e)}")
+            _despertar.clear()
+            continue
+
+        # Un fallo al guardar el resultado no debe terminar el worker; el trabajo
+        # queda en 'en_proceso' y la recuperación lo reencola al vencer el latido
+        try:
+            await _ejecutar(*reclamado)
+        except Exception as e:
+            logger.error(f"Worker {numero}: error en el trabajo {reclamado[0]}: {str(e)}")
+
+
+async def iniciar_workers() -> None:
+    global _activo
+    _activo = True
+    recuperados = await run_in_threadpool(recuperar_trabajos_interrumpidos)
+    if recuperados:
+        logger.info(f"Se recuperaron {recuperados} trabajos interrumpidos")
+    for numero in range(PLAN_JOB_WORKERS):
+        _tareas.append(asyncio.create_task(_worker(numero)))
+
+
+async def detener_workers() -> None:
+    global _activo
+    _activo = False
+    _despertar.set()
+    for tarea in _tareas:
+        tarea.cancel()
+    await asyncio.gather(*_tareas, return_exceptions=True)
+    _tareas.clear()
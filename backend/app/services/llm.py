@@ -0,0 +1,76 @@
+import asyncio
+import os
+import logging
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno
+load_dotenv()
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+# Número máximo de generaciones simultáneas por proceso
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+
+_cliente: Optional[AsyncOpenAI] = None
+_semaforo = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+
+def get_cliente() -> AsyncOpenAI:
+    """
+    Retorna el cliente asíncrono de OpenAI, creándolo en el primer uso.
+    OPENAI_BASE_URL permite apuntar a un servidor compatible (por ejemplo uno local).
+    """
+    global _cliente
+    if _cliente is None:
+        _cliente = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL or None,
+            timeout=OPENAI_TIMEOUT
+        )
+    return _cliente
+
+
+async def completar_chat(sistema: str, prompt: str, max_tokens: int = 8000) -> str:
+    """
+    Envía un prompt al modelo sin bloquear el event loop.
+    Las llamadas que superan OPENAI_MAX_CONCURRENCY esperan su turno en el semáforo.
+    """
+    async with _semaforo:
+        response = await get_cliente().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": sistema},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens
+        )
+    return response.choices[0].message.content
+
+
+
+async def completar_chat_stream(sistema: str, prompt: str, max_tokens: int = 8000) -> AsyncIterator[str]:
+    """
+    Igual que completar_chat, pero entrega el texto a medida que el modelo lo genera.
+    El cupo del semáforo se mantiene hasta que el stream termina o se cierra.
+    """
+    async with _semaforo:
+        stream = await get_cliente().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": sistema},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            async for evento in stream:
+                if evento.choices and evento.choices[0].delta.content:
+                    yield evento.choices[0].delta.content
+        finally:
+            await stream.close()
@@ -0,0 +1,192 @@
+"""
+Caché local de generaciones de planes.
+
+Los prompts de comidas y entrenamiento dependen solo de algunos datos del perfil
+y de la ventana de fechas. Usuarios con perfiles equivalentes reciben entonces
+la misma respuesta del modelo: se guarda el texto generado bajo un hash de los
+datos normalizados y, al reutilizarlo, se desplazan sus fechas para que el
+plan comience hoy.
+
+El almacenamiento es un archivo SQLite local con expiración por TTL y
+desalojo LRU cuando se supera el número máximo de entradas.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Cargar variables de entorno
+load_dotenv()
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(tempfile.gettempdir(), "evolucionat_plan_cache.sqlite3"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1000"))
+
+# Fechas DD-MM-YYYY, el formato que se pide al modelo en ambos prompts
+FECHA_RE = re.compile(r'\b(\d{2})-(\d{2})-(\d{4})\b')
+
+_lock = threading.Lock()
+_conexion: Optional[sqlite3.Connection] = None
+_contadores = {"hits": 0, "misses": 0, "expirados": 0, "desalojados": 0, "guardados": 0}
+
+
+def _normalizar(valor: Any) -> Any:
+    if isinstance(valor, str):
+        return " ".join(valor.split()).lower()
+    if isinstance(valor, (list, tuple)):
+        return sorted(_normalizar(v) for v in valor)
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items()}
+    if valor is None or isinstance(valor, (bool, int)):
+        return valor
+    return str(valor)
+
+
+def calcular_clave(tipo: str, datos: Dict[str, Any]) -> str:
+    """
+    Hash estable de los datos del prompt: sin distinguir mayúsculas, espacios
+    ni el orden de las listas.
+    """
+    contenido = json.dumps({"tipo": tipo, "datos": _normalizar(datos)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def desplazar_fechas(texto: str, dias: int) -> str:
+    """
+    Desplaza `dias` días todas las fechas DD-MM-YYYY del texto.
+    """
+    if dias == 0:
+        return texto
+
+    def reemplazar(match):
+        try:
+            fecha = datetime.strptime(match.group(0), '%d-%m-%Y').date()
+        except ValueError:
+            return match.group(0)
+        return date.fromordinal(fecha.toordinal() + dias).strftime('%d-%m-%Y')
+
+    return FECHA_RE.sub(reemplazar, texto)
+
+
+def _get_conexion() -> sqlite3.Connection:
+    global _conexion
+    if _conexion is None:
+        _conexion = sqlite3.connect(PLAN_CACHE_PATH, check_same_thread=False)
+        _conexion.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plan_cache (
+                clave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                texto TEXT NOT NULL,
+                fecha_base TEXT NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_uso REAL NOT NULL
+            )
+            """
+        )
+        _conexion.execute("CREATE INDEX IF NOT EXISTS plan_cache_ultimo_uso ON plan_cache (ultimo_uso)")
+        _conexion.commit()
+    return _conexion
+
+
+def obtener(tipo: str, datos: Dict[str, Any], hoy: Optional[date] = None) -> Optional[str]:
+    """
+    Retorna el plan en caché re-fechado a `hoy`, o None si no hay una entrada vigente.
+    """
+    if not PLAN_CACHE_ENABLED:
+        return None
+    hoy = hoy or date.today()
+    clave = calcular_clave(tipo, datos)
+    ahora = time.time()
+    try:
+        with _lock:
+            conexion = _get_conexion()
+            fila = conexion.execute(
+                "SELECT texto, fecha_base, creado FROM plan_cache WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                _contadores["misses"] += 1
+                return None
+            texto, fecha_base, creado = fila
+            if ahora - creado > PLAN_CACHE_TTL_SECONDS:
+                conexion.execute("DELETE FROM plan_cache WHERE clave = ?", (clave,))
+                conexion.commit()
+                _contadores["expirados"] += 1
+                _contadores["misses"] += 1
+                return None
+            conexion.execute("UPDATE plan_cache SET ultimo_uso = ? WHERE clave = ?", (ahora, clave))
+            conexion.commit()
+            _contadores["hits"] += 1
+    except sqlite3.Error as e:
+        # La caché nunca debe impedir generar un plan
+        logger.error(f"Error al leer la caché de planes: {str(e)}")
+        return None
+
+    desplazamiento = (hoy - date.fromisoformat(fecha_base)).days
+    return desplazar_fechas(texto, desplazamiento)
+
+
+def guardar(tipo: str, datos: Dict[str, Any], texto: str, hoy: Optional[date] = None) -> None:
+    """
+    Guarda un plan generado tomando `hoy` como su fecha de inicio y desaloja
+    las entradas menos usadas si se supera PLAN_CACHE_MAX_ENTRIES.
+    """
+    if not PLAN_CACHE_ENABLED:
+        return
+    hoy = hoy or date.today()
+    clave = calcular_clave(tipo, datos)
+    ahora = time.time()
+    try:
+        with _lock:
+            conexion = _get_conexion()
+            conexion.execute(
+                "INSERT OR REPLACE INTO plan_cache (clave, tipo, texto, fecha_base, creado, ultimo_uso) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, tipo, texto, hoy.isoformat(), ahora, ahora)
+            )
+            _contadores["guardados"] += 1
+            sobrantes = conexion.execute(
+                "SELECT COUNT(*) FROM plan_cache"
+            ).fetchone()[0] - PLAN_CACHE_MAX_ENTRIES
+            if sobrantes > 0:
+                conexion.execute(
+                    "DELETE FROM plan_cache WHERE clave IN "
+                    "(SELECT clave FROM plan_cache ORDER BY ultimo_uso LIMIT ?)",
+                    (sobrantes,)
+                )
+                _contadores["desalojados"] += sobrantes
+            conexion.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error al guardar en la caché de planes: {str(e)}")
+
+
+def estadisticas() -> Dict[str, Any]:
+    """
+    Contadores del proceso y número de entradas almacenadas.
+    """
+    entradas = None
+    if PLAN_CACHE_ENABLED:
+        try:
+            with _lock:
+                entradas = _get_conexion().execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error al leer la caché de planes: {str(e)}")
+    consultas = _contadores["hits"] + _contadores["misses"]
+    return {
+        **_contadores,
+        "entradas": entradas,
+        "tasa_aciertos": round(_contadores["hits"] / consultas, 4) if consultas else None,
+        "habilitada": PLAN_CACHE_ENABLED,
+    }
@@ -0,0 +1,344 @@
+from contextlib import aclosing
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List
+from app.database import SessionLocal
+from app.models import models_auto as models
+from app.crud.plan_dieta_usuario import (
+    crear_cabecera_plan_comidas,
+    insertar_dias_plan_comidas,
+    insertar_plan_comidas,
+)
+from app.crud.plan_rutina_usuario import (
+    crear_cabecera_plan_entrenamiento,
+    insertar_dias_plan_entrenamiento,
+    insertar_plan_entrenamiento,
+)
+from app.services import plan_cache
+from app.services.llm import completar_chat, completar_chat_stream
+from app.utils.plan_parser import (
+    MealPlanStreamParser,
+    TrainingPlanStreamParser,
+    iterar_dias,
+    parse_meal_plan_table,
+    parse_training_plan_table,
+)
+
+SISTEMA_COMIDAS = "Eres un experto en nutrición y dietética."
+SISTEMA_ENTRENAMIENTO = "Eres un experto en entrenamiento y deportes."
+
+
+def datos_prompt_comidas(db: Session, id_usuario: int) -> Dict[str, Any]:
+    """
+    Reúne los datos del perfil de los que depende el prompt del plan de comidas.
+    También son la clave de la caché de generaciones.
+    """
+    # Obtener datos del usuario
+    perfil = db.query(models.PerfilUsuario).filter(
+        models.PerfilUsuario.id_usuario == id_usuario
+    ).first()
+
+    if not perfil:
+        raise HTTPException(
+            status_code=404,
+            detail="Perfil de usuario no encontrado"
+        )
+
+    # Obtener preferencias alimentarias
+    preferencias = db.query(models.PreferenciasAlimentarias).filter(
+        models.PreferenciasAlimentarias.id_perfil == perfil.id
+    ).all()
+
+    # Obtener alimentos evitados
+    alimentos_evitados = db.query(models.AlimentosEvitados).filter(
+        models.AlimentosEvitados.id_perfil == perfil.id
+    ).all()
+
+    return {
+        "objetivo_principal": perfil.objetivo_principal,
+        "preferencias": [f"{p.tipo}: {p.valor}" for p in preferencias],
+        "alimentos_evitados": [a.descripcion for a in alimentos_evitados]
+    }
+
+
+def prompt_comidas(datos: Dict[str, Any]) -> str:
+    return f"""
+        El usuario:
+        - Objetivo: {datos['objetivo_principal']}
+        - Preferencias alimentarias: {', '.join(datos['preferencias'])}
+        - Alimentos evitados: {', '.join(datos['alimentos_evitados'])}
+
+        Genera una tabla de plan de comidas con columnas:
+        Fecha (dd-mm-yyyy) | Comida | Plato | Proteínas | Grasas | Carbohidratos | Kcal Totales
+
+        – Cubre desde {datetime.now().strftime('%d-%m-%Y')} hasta {(datetime.now() + timedelta(days=30)).strftime('%d-%m-%Y')}
+        – Para cada día, incluye 5 comidas: Desayuno, Almuerzo, Cena, y 2 Snacks
+        – Cada comida debe tener sus macronutrientes y calorías
+        – Devuelve solo la tabla, sin texto adicional.
+        """
+
+
+def leer_datos_prompt(datos_prompt: Callable, id_usuario: int) -> Dict[str, Any]:
+    """
+    Lee los datos del prompt (datos_prompt_comidas o datos_prompt_entrenamiento)
+    en una sesión propia que se cierra antes de llamar al modelo: ninguna
+    conexión del pool queda tomada mientras se espera la generación.
+    Se ejecuta en el threadpool (run_in_threadpool).
+    """
+    with SessionLocal() as db:
+        return datos_prompt(db, id_usuario)
+
+
+def guardar_plan(insertar_plan: Callable, id_usuario: int, dias: List[Dict[str, Any]]) -> None:
+    """
+    Guarda un plan generado en una sesión nueva y confirma la transacción.
+    Se ejecuta en el threadpool (run_in_threadpool).
+    """
+    with SessionLocal() as db:
+        try:
+            insertar_plan(db, id_usuario, dias)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+
+def construir_prompt_comidas(db: Session, id_usuario: int) -> str:
+    """
+    Construye el prompt del plan de comidas a partir del perfil del usuario.
+    """
+    return prompt_comidas(datos_prompt_comidas(db, id_usuario))
+
+
+async def _completar_con_cache(tipo: str, datos: Dict[str, Any], sistema: str, prompt: str, parsear: Callable):
+    """
+    Retorna (texto, días parseados), reutilizando una generación en caché si
+    existe. Solo se guardan en caché las respuestas que producen al menos un día.
+    """
+    texto = await run_in_threadpool(plan_cache.obtener, tipo, datos)
+    if texto is not None:
+        return texto, parsear(texto)
+
+    texto = await completar_chat(sistema, prompt)
+    dias = parsear(texto)
+    if dias:
+        await run_in_threadpool(plan_cache.guardar, tipo, datos, texto)
+    return texto, dias
+
+
+async def generar_plan_comidas(id_usuario: int) -> dict:
+    """
+    Genera, parsea y guarda un plan de comidas de 30 días para el usuario.
+    Las lecturas y escrituras usan sesiones cortas en el threadpool.
+    """
+    datos = await run_in_threadpool(leer_datos_prompt, datos_prompt_comidas, id_usuario)
+
+    # Llamar a OpenAI (o reutilizar un plan de un perfil equivalente)
+    plan_text, plan_datos = await _completar_con_cache(
+        "comidas", datos, SISTEMA_COMIDAS, prompt_comidas(datos), parse_meal_plan_table
+    )
+
+    # Almacenar el plan
+    await run_in_threadpool(guardar_plan, insertar_plan_comidas, id_usuario, plan_datos)
+
+    return {
+        "meal_plan": plan_text,
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+def datos_prompt_entrenamiento(db: Session, id_usuario: int) -> Dict[str, Any]:
+    """
+    Reúne los datos del perfil de los que depende el prompt del plan de entrenamiento.
+    También son la clave de la caché de generaciones.
+    """
+    # Obtener datos del usuario
+    user_profile = db.query(models.PerfilUsuario).filter(
+        models.PerfilUsuario.id_usuario == id_usuario
+    ).first()
+
+    if not user_profile:
+        raise HTTPException(status_code=404, detail="Perfil de usuario no encontrado")
+
+    # Obtener condición física
+    physical_condition = db.query(models.CondicionFisica).filter(
+        models.CondicionFisica.id_perfil == user_profile.id
+    ).first()
+
+    # Obtener ejercicios preferidos
+    preferred_exercises = db.query(models.EjercicioPreferido).filter(
+        models.EjercicioPreferido.id_perfil == user_profile.id
+    ).all()
+
+    # Obtener equipamiento disponible
+    available_equipment = db.query(models.EquipamientoDisponible).filter(
+        models.EquipamientoDisponible.id_perfil == user_profile.id
+    ).all()
+
+    return {
+        "edad": user_profile.edad,
+        "genero": user_profile.genero,
+        "peso": user_profile.peso,
+        "altura": user_profile.altura,
+        "objetivo_principal": user_profile.objetivo_principal,
+        "nivel_actividad": user_profile.nivel_actividad,
+        "tiempo_meta": user_profile.tiempo_meta,
+        "nivel_compromiso": user_profile.nivel_compromiso,
+        "frecuencia_ejercicio": physical_condition.frecuencia_ejercicio if physical_condition else None,
+        "tiempo_disponible": physical_condition.tiempo_disponible if physical_condition else None,
+        "ejercicios_preferidos": [ej.tipo for ej in preferred_exercises],
+        "equipamiento": [eq.equipo for eq in available_equipment]
+    }
+
+
+def prompt_entrenamiento(datos: Dict[str, Any]) -> str:
+    return f"""
+        Genera un plan de entrenamiento personalizado para un usuario con las siguientes características:
+
+        Perfil:
+        - Edad: {datos['edad']} años
+        - Género: {datos['genero']}
+        - Peso: {datos['peso']} kg
+        - Altura: {datos['altura']} cm
+        - Objetivo: {datos['objetivo_principal']}
+        - Nivel de actividad: {datos['nivel_actividad']}
+        - Tiempo meta: {datos['tiempo_meta']}
+        - Nivel de compromiso: {datos['nivel_compromiso']}
+
+        Condición Física:
+        - Frecuencia de ejercicio: {datos['frecuencia_ejercicio'] or 'No especificada'}
+        - Tiempo disponible: {datos['tiempo_disponible'] or 'No especificado'}
+
+        Ejercicios Preferidos:
+        {', '.join(datos['ejercicios_preferidos']) if datos['ejercicios_preferidos'] else 'No especificados'}
+
+        Equipamiento Disponible:
+        {', '.join(datos['equipamiento']) if datos['equipamiento'] else 'No especificado'}
+
+        Genera una tabla con el siguiente formato:
+        | Fecha | Tipo de día | Ejercicio | Series | Repeticiones | Descanso | Notas |
+        |-------|-------------|-----------|---------|--------------|----------|-------|
+
+        Reglas:
+        1. El plan debe cubrir 30 días comenzando desde HOY ({datetime.now().strftime('%d-%m-%Y')})
+        2. Incluir días de fuerza, cardio y descanso
+        3. Para ejercicios de fuerza:
+           - Mínimo 3 series
+           - Mínimo 8 repeticiones
+           - Descanso entre series: 60-90 segundos
+        4. Para ejercicios de cardio:
+           - Series: 1
+           - Repeticiones: duración en minutos
+           - Descanso: según el ejercicio
+        5. Los nombres de los ejercicios deben ser completos y correctos
+        6. Usar el formato de fecha DD-MM-YYYY
+        """
+
+
+def construir_prompt_entrenamiento(db: Session, id_usuario: int) -> str:
+    """
+    Construye el prompt del plan de entrenamiento a partir del perfil del usuario.
+    """
+    return prompt_entrenamiento(datos_prompt_entrenamiento(db, id_usuario))
+
+
+async def generar_plan_entrenamiento(id_usuario: int) -> dict:
+    """
+    Genera, parsea y guarda un plan de entrenamiento de 30 días para el usuario.
+    Las lecturas y escrituras usan sesiones cortas en el threadpool.
+    """
+    datos = await run_in_threadpool(leer_datos_prompt, datos_prompt_entrenamiento, id_usuario)
+
+    # Generar el plan con OpenAI (o reutilizar un plan de un perfil equivalente)
+    plan_text, plan_days = await _completar_con_cache(
+        "entrenamiento", datos, SISTEMA_ENTRENAMIENTO, prompt_entrenamiento(datos), parse_training_plan_table
+    )
+
+    if not plan_days:
+        raise HTTPException(status_code=500, detail="Error al parsear el plan de entrenamiento")
+
+    await run_in_threadpool(guardar_plan, insertar_plan_entrenamiento, id_usuario, plan_days)
+
+    return {"message": "Plan de entrenamiento generado exitosamente"}
+
+
+def _guardar_dia(db: Session, crear_cabecera: Callable, insertar_dias: Callable,
+                 id_usuario: int, id_plan, dia: Dict[str, Any]) -> int:
+    """
+    Inserta un día (creando el plan si es el primero) y confirma la transacción.
+    """
+    try:
+        if id_plan is None:
+            id_plan = crear_cabecera(db, id_usuario)
+        insertar_dias(db, id_plan, [dia])
+        db.commit()
+        return id_plan
+    except Exception:
+        db.rollback()
+        raise
+
+
+async def _texto_en_cache(texto: str) -> AsyncIterator[str]:
+    yield texto
+
+
+async def _acumular(chunks: AsyncIterator[str], partes: List[str]) -> AsyncIterator[str]:
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            partes.append(chunk)
+            yield chunk
+
+
+async def _generar_plan_stream(tipo: str, sistema: str, datos: Dict[str, Any], prompt: str, parser,
+                               crear_cabecera: Callable, insertar_dias: Callable,
+                               id_usuario: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Consume la respuesta del modelo en streaming y entrega cada día apenas se
+    completa. Cada día se guarda y se confirma antes de entregarse, de modo que
+    lo que recibe el cliente ya está persistido aunque la generación se corte después.
+    El plan se crea con el primer día para no dejar planes vacíos si el modelo falla.
+    Si hay una generación en caché para los mismos datos se reutiliza sin llamar al modelo.
+    """
+    texto = await run_in_threadpool(plan_cache.obtener, tipo, datos)
+    partes: List[str] = []
+    if texto is not None:
+        chunks = _texto_en_cache(texto)
+    else:
+        chunks = _acumular(completar_chat_stream(sistema, prompt), partes)
+
+    id_plan = None
+    with SessionLocal() as db:
+        async with aclosing(chunks):
+            async for dia in iterar_dias(parser, chunks):
+                id_plan = await run_in_threadpool(
+                    _guardar_dia, db, crear_cabecera, insertar_dias, id_usuario, id_plan, dia
+                )
+                yield dia
+
+    # La respuesta llegó completa: guardarla para perfiles equivalentes
+    if texto is None and id_plan is not None:
+        await run_in_threadpool(plan_cache.guardar, tipo, datos, "".join(partes))
+
+
+def generar_plan_comidas_stream(datos: Dict[str, Any], id_usuario: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Genera el plan de comidas entregando y guardando cada día a medida que se genera.
+    Los datos se obtienen antes con leer_datos_prompt(datos_prompt_comidas, ...).
+    """
+    return _generar_plan_stream(
+        "comidas", SISTEMA_COMIDAS, datos, prompt_comidas(datos), MealPlanStreamParser(),
+        crear_cabecera_plan_comidas, insertar_dias_plan_comidas, id_usuario
+    )
+
+
+def generar_plan_entrenamiento_stream(datos: Dict[str, Any], id_usuario: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Genera el plan de entrenamiento entregando y guardando cada día a medida que se genera.
+    Los datos se obtienen antes con leer_datos_prompt(datos_prompt_entrenamiento, ...).
+    """
+    return _generar_plan_stream(
+        "entrenamiento", SISTEMA_ENTRENAMIENTO, datos, prompt_entrenamiento(datos), TrainingPlanStreamParser(),
+        crear_cabecera_plan_entrenamiento, insertar_dias_plan_entrenamiento, id_usuario
+    )
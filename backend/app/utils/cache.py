@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Cachés creadas en el proceso, por nombre, para exponer sus métricas
+CACHES: Dict[str, "CacheTTL"] = {}
+
+_SIN_VALOR = object()
+
+
+class CacheTTL:
+    """
+    Caché en memoria del proceso con expiración por TTL y desalojo LRU.
+    Es segura entre hilos (las dependencias síncronas de FastAPI corren en un threadpool).
+    Cada worker de uvicorn tiene su propia copia, por eso los TTL deben ser cortos.
+    """
+
+    def __init__(self, nombre: str, ttl_segundos: float, max_entradas: int = 10000):
+        self.nombre = nombre
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.desalojados = 0
+        self.invalidados = 0
+        CACHES[nombre] = self
+
+    def obtener(self, clave: Hashable, defecto: Any = None) -> Any:
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave, _SIN_VALOR)
+            if entrada is _SIN_VALOR or entrada[0] < ahora:
+                if entrada is not _SIN_VALOR:
+                    del self._datos[clave]
+                self.misses += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def guardar(self, clave: Hashable, valor: Any, ttl_segundos: Optional[float] = None) -> None:
+        expira = time.monotonic() + (self.ttl_segundos if ttl_segundos is None else ttl_segundos)
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojados += 1
+
+    def invalidar(self, clave: Hashable) -> None:
+        with self._lock:
+            if self._datos.pop(clave, _SIN_VALOR) is not _SIN_VALOR:
+                self.invalidados += 1
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "desalojados": self.desalojados,
+            "invalidados": self.invalidados,
+            "entradas": len(self._datos),
+            "tasa_aciertos": round(self.hits / consultas, 4) if consultas else None,
+        }
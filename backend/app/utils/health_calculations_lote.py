@@ -0,0 +1,94 @@
+"""
+Versión vectorizada con NumPy de health_calculations, para recalcular las
+métricas de muchos perfiles a la vez (scripts.recalcular_metricas_salud).
+
+Recibe columnas como arreglos y aplica las mismas fórmulas con las mismas
+operaciones en float64 que las funciones escalares, de modo que los
+resultados coinciden con calculate_all_metrics.
+"""
+from typing import Dict
+
+import numpy as np
+
+# Límites superiores (exclusivos) de cada categoría de IMC, los de calculate_imc
+LIMITES_IMC = np.array([18.5, 27, 32, 37, 42])
+
+# Código de categoría de IMC -> texto de calculate_imc
+CATEGORIAS_IMC = (
+    "Bajo peso",
+    "Normal (saludable)",
+    "Sobrepeso",
+    "Obesidad grado I",
+    "Obesidad grado II",
+    "Obesidad grado III",
+)
+
+def redondear(valores: np.ndarray, decimales: int = 2) -> np.ndarray:
+    """
+    Redondeo igual al round() de Python, que redondea el valor binario exacto.
+    np.round redondea valores * 10**decimales ya redondeado a float64 y difiere
+    cuando ese producto cae justo en la mitad sin serlo el valor exacto
+    (p. ej. 0.015 -> 0.01 en Python, 0.02 en NumPy). En esos empates se usa el
+    error exacto del producto (división de Veltkamp) para decidir el lado.
+    """
+    factor = float(10 ** decimales)
+    escalados = valores * factor
+    # valores * factor == escalados + error exactamente (factor cabe en 26 bits)
+    partido = 134217729.0 * valores
+    alto = partido - (partido - valores)
+    bajo = valores - alto
+    error = (alto * factor - escalados) + bajo * factor
+
+    redondeados = np.rint(escalados)
+    piso = np.floor(escalados)
+    empates = escalados - piso == 0.5
+    redondeados[empates & (error > 0)] = piso[empates & (error > 0)] + 1
+    redondeados[empates & (error < 0)] = piso[empates & (error < 0)]
+    return redondeados / factor
+
+def calcular_metricas_lote(edad, genero, peso, altura) -> Dict[str, np.ndarray]:
+    """
+    Calcula las métricas de salud de muchos perfiles.
+
+    Args:
+        edad: Edades en años
+        genero: Géneros ('masculino', 'femenino', ...) o booleanos es_masculino
+        peso: Pesos en kilogramos
+        altura: Alturas en centímetros
+
+    Returns:
+        Dict de arreglos del mismo largo: tmb, peso_ideal,
+        frecuencia_cardiaca_maxima, imc, codigo_imc (índice en CATEGORIAS_IMC)
+        y diferencia_peso
+    """
+    edad = np.asarray(edad, dtype=np.float64)
+    peso = np.asarray(peso, dtype=np.float64)
+    altura = np.asarray(altura, dtype=np.float64)
+    genero = np.asarray(genero)
+    if genero.dtype == np.bool_:
+        es_masculino = genero
+    else:
+        es_masculino = np.char.lower(genero.astype(str)) == 'masculino'
+
+    # Mifflin-St Jeor
+    tmb = redondear((10 * peso) + (6.25 * altura) - (5 * edad) + np.where(es_masculino, 5, -161))
+
+    # Devine, con la altura en pulgadas
+    altura_pulgadas = altura / 2.54
+    peso_ideal = redondear(np.where(es_masculino, 50, 45.5) + 2.3 * (altura_pulgadas - 60))
+
+    # Tanaka; np.rint redondea al par igual que round()
+    frecuencia_cardiaca_maxima = np.rint(208 - (0.7 * edad)).astype(np.int64)
+
+    altura_metros = altura / 100
+    imc = peso / (altura_metros * altura_metros)
+    codigo_imc = np.searchsorted(LIMITES_IMC, imc, side='right')
+
+    return {
+        "tmb": tmb,
+        "peso_ideal": peso_ideal,
+        "frecuencia_cardiaca_maxima": frecuencia_cardiaca_maxima,
+        "imc": redondear(imc),
+        "codigo_imc": codigo_imc,
+        "diferencia_peso": redondear(peso - peso_ideal),
+    }
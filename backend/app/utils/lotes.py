@@ -0,0 +1,13 @@
+from typing import Iterator, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Filas por sentencia INSERT multi-fila; mantiene cada sentencia muy por debajo de max_allowed_packet
+TAMANO_LOTE = 500
+
+def en_lotes(filas: Sequence[T], tamano: int = TAMANO_LOTE) -> Iterator[List[T]]:
+    """
+    Divide una secuencia en lotes consecutivos de como máximo `tamano` elementos.
+    """
+    for inicio in range(0, len(filas), tamano):
+        yield list(filas[inicio:inicio + tamano])
@@ -1,115 +1,158 @@
 from datetime import datetime
+import logging
 import re
-from typing import List, Dict, Any
+from typing import AsyncIterable, AsyncIterator, List, Dict, Any, Optional
 
-def parse_training_plan_table(text: str) -> List[Dict]:
+logger = logging.getLogger(__name__)
+
+COLUMNAS_ENTRENAMIENTO = ['Fecha', 'Tipo de día', 'Ejercicio', 'Series', 'Repeticiones', 'Descanso', 'Notas']
+COLUMNAS_COMIDAS = ['| Fecha', '| Comida', '| Plato', '| Proteínas', '| Grasas', '| Carbohidratos', '| Kcal Totales']
+
+
+class _ParserTablaStream:
     """
-    Parsea una tabla de plan de entrenamiento generada por OpenAI.
-    La tabla debe tener columnas: Fecha | Tipo de día | Ejercicio | Series | Repeticiones | Descanso | Notas
+    Base de los parsers incrementales de tablas markdown.
+    Recibe el texto en fragmentos arbitrarios (tokens de una respuesta en streaming),
+    procesa solo las líneas completas y emite cada día en cuanto aparece la fila
+    de la fecha siguiente, sin esperar al final de la respuesta.
+    """
+
+    def __init__(self):
+        self._pendiente = ""
+        self._dia_actual: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Agrega un fragmento de texto y retorna los días que quedaron completos.
+        """
+        self._pendiente += chunk
+        if '\n' not in chunk:
+            return []
+        *lineas, self._pendiente = self._pendiente.split('\n')
+        completos = []
+        for line in lineas:
+            line = line.strip()
+            if line:
+                dia = self._procesar_linea(line)
+                if dia:
+                    completos.append(dia)
+        return completos
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Procesa la última línea pendiente y retorna los días que falten por emitir.
+        """
+        completos = self.feed('\n')
+        if self._dia_actual:
+            completos.append(self._dia_actual)
+            self._dia_actual = None
+        return completos
+
+    def _nuevo_dia(self, dia: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Abre un día nuevo y retorna el anterior, que ya está completo."""
+        anterior = self._dia_actual
+        self._dia_actual = dia
+        return anterior
+
+    def _procesar_linea(self, line: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class TrainingPlanStreamParser(_ParserTablaStream):
     """
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    # Eliminar líneas separadoras
-    lines = [line for line in lines if not line.startswith('|--')]
-    
-    # Encontrar los índices de las columnas
-    header_line = next(line for line in lines if 'Fecha' in line)
-    headers = [h.strip() for h in header_line.split('|')]
-    
-    fecha_idx = headers.index('Fecha')
-    tipo_dia_idx = headers.index('Tipo de día')
-    ejercicio_idx = headers.index('Ejercicio')
-    series_idx = headers.index('Series')
-    repeticiones_idx = headers.index('Repeticiones')
-    descanso_idx = headers.index('Descanso')
-    notas_idx = headers.index('Notas')
-    
-    # Procesar cada línea de datos
-    plan = []
-    current_date = None
-    current_day = None
-    
-    for line in lines:
-        if '|' not in line or 'Fecha' in line:
-            continue
-            
+    Parser incremental de la tabla de entrenamiento:
+    Fecha | Tipo de día | Ejercicio | Series | Repeticiones | Descanso | Notas
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._indices: Optional[List[int]] = None
+
+    def _procesar_linea(self, line: str) -> Optional[Dict[str, Any]]:
+        # Ignorar líneas separadoras
+        if line.startswith('|--'):
+            return None
+
+        # La primera línea con 'Fecha' define los índices de las columnas
+        if 'Fecha' in line:
+            if self._indices is None:
+                headers = [h.strip() for h in line.split('|')]
+                try:
+                    self._indices = [headers.index(columna) for columna in COLUMNAS_ENTRENAMIENTO]
+                except ValueError:
+                    logger.error(f"Encabezado de plan de entrenamiento inválido: {line}")
+            return None
+
+        if self._indices is None or '|' not in line:
+            return None
+
+        fecha_idx, tipo_dia_idx, ejercicio_idx, series_idx, repeticiones_idx, descanso_idx, notas_idx = self._indices
         values = [v.strip() for v in line.split('|')]
-        
+        completo = None
+
         try:
             # Convertir fecha
             fecha = datetime.strptime(values[fecha_idx], '%d-%m-%Y').strftime('%Y-%m-%d')
-            
+
             # Si es una nueva fecha, crear nuevo día
-            if fecha != current_date:
-                if current_day:
-                    plan.append(current_day)
-                current_date = fecha
-                current_day = {
+            if not self._dia_actual or fecha != self._dia_actual['fecha']:
+                completo = self._nuevo_dia({
                     'fecha': fecha,
                     'tipo_dia': values[tipo_dia_idx],
                     'ejercicios': []
-                }
-            
+                })
+
             # Añadir ejercicio
             ejercicio = values[ejercicio_idx]
             if ejercicio:  # Solo añadir si hay un ejercicio
                 # Convertir series y repeticiones a números
                 series = int(values[series_idx]) if values[series_idx].isdigit() else 0
                 repeticiones = int(values[repeticiones_idx]) if values[repeticiones_idx].isdigit() else 0
-                
+
                 # Asegurar valores mínimos para ejercicios de fuerza
-                if current_day['tipo_dia'].lower() == 'fuerza':
+                if self._dia_actual['tipo_dia'].lower() == 'fuerza':
                     series = max(series, 3)
                     repeticiones = max(repeticiones, 8)
-                
-                current_day['ejercicios'].append({
+
+                self._dia_actual['ejercicios'].append({
                     'nombre': ejercicio,
                     'series': series,
                     'repeticiones': repeticiones,
                     'descanso': values[descanso_idx],
                     'notas': values[notas_idx]
                 })
-                
+
         except (ValueError, IndexError) as e:
             logger.error(f"Error al procesar línea: {line}. Error: {str(e)}")
-            continue
-    
-    # Añadir el último día
-    if current_day:
-        plan.append(current_day)
-    
-    return plan
 
-def parse_meal_plan_table(table_text: str) -> List[Dict[str, Any]]:
+        return completo
+
+
+class MealPlanStreamParser(_ParserTablaStream):
     """
-    Parsea la tabla de plan de comidas generada por OpenAI.
-    Retorna una lista de diccionarios con los datos estructurados.
+    Parser incremental de la tabla de comidas:
+    Fecha | Comida | Plato | Proteínas | Grasas | Carbohidratos | Kcal Totales
     """
-    # Dividir el texto en líneas y eliminar líneas vacías
-    lines = [line.strip() for line in table_text.split('\n') if line.strip()]
-    
-    # Eliminar la línea de separación (|-----|)
-    lines = [line for line in lines if not re.match(r'^\|[\s-]+\|$', line)]
-    
-    # Obtener los índices de las columnas
-    header = lines[0]
-    fecha_idx = header.find('| Fecha')
-    comida_idx = header.find('| Comida')
-    plato_idx = header.find('| Plato')
-    proteinas_idx = header.find('| Proteínas')
-    grasas_idx = header.find('| Grasas')
-    carbohidratos_idx = header.find('| Carbohidratos')
-    calorias_idx = header.find('| Kcal Totales')
-    
-    # Procesar cada línea de datos
-    plan = []
-    current_date = None
-    current_day = None
-    
-    for line in lines[1:]:  # Saltar el encabezado
+
+    def __init__(self):
+        super().__init__()
+        self._indices: Optional[List[int]] = None
+
+    def _procesar_linea(self, line: str) -> Optional[Dict[str, Any]]:
+        # Eliminar la línea de separación (|-----|)
+        if re.match(r'^\|[\s-]+\|$', line):
+            return None
+
+        # La primera línea es el encabezado: obtener las posiciones de las columnas
+        if self._indices is None:
+            self._indices = [line.find(columna) for columna in COLUMNAS_COMIDAS]
+            return None
+
         if not line.startswith('|'):
-            continue
-            
+            return None
+
+        fecha_idx, comida_idx, plato_idx, proteinas_idx, grasas_idx, carbohidratos_idx, calorias_idx = self._indices
+
         # Extraer valores
         fecha = line[fecha_idx:comida_idx].strip('| ').strip()
         tipo_comida = line[comida_idx:plato_idx].strip('| ').strip()
@@ -118,26 +161,24 @@ def parse_meal_plan_table(table_text: str) -> List[Dict[str, Any]]:
         grasas = line[grasas_idx:carbohidratos_idx].strip('| ').strip()
         carbohidratos = line[carbohidratos_idx:calorias_idx].strip('| ').strip()
         calorias = line[calorias_idx:].strip('| ').strip()
-        
+
         # Convertir fecha
         try:
             fecha = datetime.strptime(fecha, '%d-%m-%Y').date()
         except ValueError:
-            continue
-            
+            return None
+
         # Si es un nuevo día, crear nueva entrada
-        if fecha != current_date:
-            if current_day:
-                plan.append(current_day)
-            current_date = fecha
-            current_day = {
+        completo = None
+        if not self._dia_actual or fecha != self._dia_actual['fecha']:
+            completo = self._nuevo_dia({
                 'fecha': fecha,
                 'comidas': []
-            }
-        
+            })
+
         # Agregar comida
         try:
-            current_day['comidas'].append({
+            self._dia_actual['comidas'].append({
                 'tipo_comida': tipo_comida,
                 'plato': plato,
                 'proteinas': float(proteinas),
@@ -146,10 +187,36 @@ def parse_meal_plan_table(table_text: str) -> List[Dict[str, Any]]:
                 'calorias': float(calorias)
             })
         except ValueError:
-            continue
-    
-    # Agregar el último día
-    if current_day:
-        plan.append(current_day)
-        
-    return plan 
\ No newline at end of file
+            pass
+
+        return completo
+
+
+async def iterar_dias(parser: _ParserTablaStream, chunks: AsyncIterable[str]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Alimenta el parser con los fragmentos de un stream y entrega cada día
+    apenas queda completo.
+    """
+    async for chunk in chunks:
+        for dia in parser.feed(chunk):
+            yield dia
+    for dia in parser.close():
+        yield dia
+
+
+def parse_training_plan_table(text: str) -> List[Dict]:
+    """
+    Parsea una tabla de plan de entrenamiento generada por OpenAI.
+    La tabla debe tener columnas: Fecha | Tipo de día | Ejercicio | Series | Repeticiones | Descanso | Notas
+    """
+    parser = TrainingPlanStreamParser()
+    return parser.feed(text) + parser.close()
+
+
+def parse_meal_plan_table(table_text: str) -> List[Dict[str, Any]]:
+    """
+    Parsea la tabla de plan de comidas generada por OpenAI.
+    Retorna una lista de diccionarios con los datos estructurados.
+    """
+    parser = MealPlanStreamParser()
+    return parser.feed(table_text) + parser.close()
@@ -0,0 +1,42 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+def _serializar_extra(valor: Any) -> Any:
+    """
+    Tipos que orjson no serializa por sí mismo. Las fechas, datetimes, UUID y
+    dataclasses los maneja de forma nativa.
+    """
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, BaseModel):
+        return valor.dict()
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo no serializable a JSON: {type(valor).__name__}")
+
+class RespuestaJSONRapida(JSONResponse):
+    """
+    JSONResponse serializada con orjson, respuesta por defecto de la app.
+    Las rutas con respuestas grandes pueden devolverla directamente para
+    evitar además el jsonable_encoder de FastAPI, que recorre el contenido
+    objeto por objeto antes de serializarlo.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_serializar_extra, option=orjson.OPT_NON_STR_KEYS)
+
+def etag_coincide(if_none_match: str, etag: str) -> bool:
+    """
+    Compara la cabecera If-None-Match con un ETag entre comillas, con la
+    comparación débil de la revalidación (se ignora el prefijo W/).
+    """
+    etiquetas = [etiqueta.strip() for etiqueta in if_none_match.split(",")]
+    return "*" in etiquetas or any(
+        (etiqueta[2:] if etiqueta.startswith("W/") else etiqueta) == etag
+        for etiqueta in etiquetas
+    )
@@ -0,0 +1,29 @@
+from decimal import Decimal
+from typing import List, Optional, Sequence
+
+def medias_moviles(valores: Sequence[float], ventana: int) -> List[float]:
+    """
+    Media móvil simple de los últimos `ventana` valores en cada posición.
+    Las primeras posiciones promedian los valores disponibles.
+    """
+    medias = []
+    suma = 0.0
+    for i, valor in enumerate(valores):
+        suma += valor
+        if i >= ventana:
+            suma -= valores[i - ventana]
+        medias.append(round(suma / min(i + 1, ventana), 4))
+    return medias
+
+def pendiente_minimos_cuadrados(n, suma_x, suma_y, suma_xy, suma_xx) -> Optional[float]:
+    """
+    Pendiente de la recta de mínimos cuadrados a partir de las sumas de los puntos.
+    Se calcula con Decimal: con x en días absolutos (TO_DAYS) los términos
+    n*Σx² y (Σx)² son enormes y casi iguales, y en float se pierde la precisión.
+    Retorna None si hay menos de dos valores distintos de x.
+    """
+    n, sx, sy, sxy, sxx = (Decimal(str(v)) for v in (n, suma_x, suma_y, suma_xy, suma_xx))
+    denominador = n * sxx - sx * sx
+    if denominador == 0:
+        return None
+    return round(float((n * sxy - sx * sy) / denominador), 6)
@@ -0,0 +1,34 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras para que proxies (nginx) no acumulen la respuesta antes de enviarla
+CABECERAS_SSE = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def formatear_evento(evento: str, datos: Any) -> str:
+    """
+    Serializa un server-sent event con nombre y datos JSON.
+    """
+    return f"event: {evento}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+async def eventos_plan(dias: AsyncIterator[Dict[str, Any]], mensaje_error: str) -> AsyncIterator[str]:
+    """
+    Convierte un iterador de días en eventos SSE: un evento 'dia' por cada día,
+    'fin' con el total al terminar y 'error' si la generación falla a mitad.
+    """
+    total = 0
+    try:
+        async for dia in dias:
+            total += 1
+            yield formatear_evento("dia", dia)
+        if total == 0:
+            yield formatear_evento("error", {"detail": mensaje_error})
+            return
+        yield formatear_evento("fin", {"dias": total})
+    except Exception as e:
+        logger.error(f"{mensaje_error}: {str(e)}")
+        yield formatear_evento("error", {"detail": f"{mensaje_error}: {str(e)}", "dias": total})
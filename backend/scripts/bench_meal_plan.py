@@ -0,0 +1,108 @@
+"""
+Benchmark de lectura de GET /api/meal-plan.
+
+Siembra un plan de comidas de 30 días (5 comidas por día) y compara el acceso
+anterior (una consulta por día) con obtener_plan_comidas_completo.
+
+    python -m scripts.bench_meal_plan [--url URL] [--dias 30] [--iteraciones 200]
+"""
+from datetime import date, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.models import models_auto as models
+from app.crud.plan_dieta_usuario import obtener_plan_comidas_completo
+from scripts.bench_utils import crear_parser, crear_engine, crear_tablas, medir, reportar
+
+TABLAS = [
+    models.PlanDietaUsuario.__table__,
+    models.PlanComidasDiario.__table__,
+    models.DetallePlanComidas.__table__,
+]
+
+COMIDAS = ["Desayuno", "Snack 1", "Almuerzo", "Snack 2", "Cena"]
+
+
+def sembrar_plan(db, id_usuario: int, dias: int) -> None:
+    plan = models.PlanDietaUsuario(id_usuario=id_usuario, id_estado_plan=1)
+    db.add(plan)
+    db.flush()
+    inicio = date.today()
+    for i in range(dias):
+        dia = models.PlanComidasDiario(id_plan_dieta=plan.id, fecha=inicio + timedelta(days=i))
+        db.add(dia)
+        db.flush()
+        for comida in COMIDAS:
+            db.add(models.DetallePlanComidas(
+                id_plan_diario=dia.id,
+                tipo_comida=comida,
+                plato=f"{comida} del día {i + 1}",
+                proteinas=25,
+                grasas=12,
+                carbohidratos=40,
+                calorias=380
+            ))
+    db.commit()
+
+
+def plan_por_dia(db, id_usuario: int):
+    """Ruta de lectura anterior: plan, días y una consulta de detalles por día."""
+    plan_dieta = db.query(models.PlanDietaUsuario).filter(
+        models.PlanDietaUsuario.id_usuario == id_usuario
+    ).order_by(models.PlanDietaUsuario.id.desc()).first()
+    dias_plan = db.query(models.PlanComidasDiario).filter(
+        models.PlanComidasDiario.id_plan_dieta == plan_dieta.id
+    ).order_by(models.PlanComidasDiario.fecha).all()
+    plan_completo = []
+    for dia in dias_plan:
+        detalles = db.query(models.DetallePlanComidas).filter(
+            models.DetallePlanComidas.id_plan_diario == dia.id
+        ).all()
+        plan_completo.append({
+            "fecha": dia.fecha.isoformat(),
+            "comidas": [
+                {
+                    "tipo_comida": d.tipo_comida,
+                    "plato": d.plato,
+                    "proteinas": d.proteinas,
+                    "grasas": d.grasas,
+                    "carbohidratos": d.carbohidratos,
+                    "calorias": d.calorias
+                }
+                for d in detalles
+            ]
+        })
+    return plan_completo
+
+
+def main():
+    parser = crear_parser(__doc__)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--id-usuario", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url)
+    crear_tablas(engine, TABLAS)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        sembrar_plan(db, args.id_usuario, args.dias)
+
+    def anterior():
+        with Session() as db:
+            plan_por_dia(db, args.id_usuario)
+
+    def nueva():
+        with Session() as db:
+            obtener_plan_comidas_completo(db, args.id_usuario)
+
+    with Session() as db:
+        assert plan_por_dia(db, args.id_usuario) == obtener_plan_comidas_completo(db, args.id_usuario)
+
+    print(f"Plan sembrado: {args.dias} días x {len(COMIDAS)} comidas")
+    reportar("una consulta por día", *medir(engine, anterior, args.iteraciones))
+    reportar("consulta unificada", *medir(engine, nueva, args.iteraciones))
+
+
+if __name__ == "__main__":
+    main()
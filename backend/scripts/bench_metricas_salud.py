@@ -0,0 +1,104 @@
+"""
+Benchmark del cálculo de métricas de salud por lote frente al escalar.
+
+Genera perfiles sintéticos (edad, género, peso y altura con dos decimales,
+como Decimal igual que los devuelve MySQL) y mide:
+
+- escalar: calculate_all_metrics perfil por perfil.
+- vectorizado: Decimal -> arreglos float64 y calcular_metricas_lote (se
+  informa también el cálculo sin la conversión).
+- filas para guardar: de punta a punta, las filas de Metricas_Salud_Perfil
+  con armar_metricas perfil por perfil (escalar) y con armar_metricas_lote
+  por bloques, lo que hace scripts.recalcular_metricas_salud antes de escribir.
+
+También comprueba que el vectorizado da exactamente los mismos valores.
+
+    python -m scripts.bench_metricas_salud [--perfiles 1000000] [--tamano-bloque 5000]
+"""
+import argparse
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+from app.crud.metricas_salud import COLUMNAS_METRICAS, armar_metricas, armar_metricas_lote
+from app.utils.health_calculations import calculate_all_metrics
+from app.utils.health_calculations_lote import CATEGORIAS_IMC, calcular_metricas_lote
+
+Entrada = namedtuple("Entrada", "id id_usuario edad genero peso altura peso_registrado")
+
+
+def generar_perfiles(cantidad: int, semilla: int = 42):
+    rng = np.random.default_rng(semilla)
+    edades = rng.integers(16, 90, cantidad).tolist()
+    generos = rng.choice(["masculino", "femenino", "otro"], cantidad, p=[0.48, 0.48, 0.04]).tolist()
+    pesos = [Decimal(c) / 100 for c in rng.integers(4000, 18000, cantidad).tolist()]
+    alturas = [Decimal(c) / 100 for c in rng.integers(14000, 21000, cantidad).tolist()]
+    return edades, generos, pesos, alturas
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfiles", type=int, default=1_000_000)
+    parser.add_argument("--tamano-bloque", type=int, default=5000)
+    args = parser.parse_args()
+
+    edades, generos, pesos, alturas = generar_perfiles(args.perfiles)
+    n = args.perfiles
+
+    escalar, t_escalar = cronometrar(lambda: [
+        calculate_all_metrics(edad, genero, peso, altura)
+        for edad, genero, peso, altura in zip(edades, generos, pesos, alturas)
+    ])
+
+    columnas, t_conversion = cronometrar(lambda: dict(
+        edad=np.array(edades, dtype=np.float64),
+        genero=np.array(generos),
+        peso=np.array(pesos, dtype=np.float64),
+        altura=np.array(alturas, dtype=np.float64)
+    ))
+    lote, t_calculo = cronometrar(lambda: calcular_metricas_lote(**columnas))
+
+    entradas = [
+        Entrada(i + 1, i + 1, edad, genero, peso, altura, None)
+        for i, (edad, genero, peso, altura) in enumerate(zip(edades, generos, pesos, alturas))
+    ]
+    filas_escalar, t_filas_escalar = cronometrar(lambda: [armar_metricas(entrada) for entrada in entradas])
+    bloques, t_filas = cronometrar(lambda: [
+        armar_metricas_lote(entradas[inicio:inicio + args.tamano_bloque])
+        for inicio in range(0, n, args.tamano_bloque)
+    ])
+    filas_lote = [fila for filas, _ in bloques for fila in filas]
+    columnas_comparadas = ["id_usuario", "id_perfil", *COLUMNAS_METRICAS]
+    filas_distintas = len(filas_escalar) != len(filas_lote) or sum(
+        1 for escalar_fila, lote_fila in zip(filas_escalar, filas_lote)
+        if [escalar_fila[c] for c in columnas_comparadas] != [lote_fila[c] for c in columnas_comparadas]
+    )
+
+    distintos = sum(
+        1 for i, m in enumerate(escalar)
+        if (m["tmb"], m["peso_ideal"], m["frecuencia_cardiaca_maxima"], m["imc"]["valor"], m["imc"]["categoria"])
+        != (lote["tmb"][i], lote["peso_ideal"][i], lote["frecuencia_cardiaca_maxima"][i],
+            lote["imc"][i], CATEGORIAS_IMC[lote["codigo_imc"][i]])
+    )
+
+    print(f"{n} perfiles sintéticos; resultados distintos entre escalar y vectorizado: {distintos}; filas distintas: {filas_distintas}")
+    for nombre, segundos in [
+        ("escalar", t_escalar),
+        ("vectorizado", t_conversion + t_calculo),
+        ("  solo el cálculo", t_calculo),
+        ("filas escalar", t_filas_escalar),
+        ("filas vectorizado", t_filas),
+    ]:
+        print(f"{nombre:<20} {segundos:8.3f} s  {segundos / n * 1e9:8.0f} ns/perfil  {n / segundos:12,.0f} perfiles/s")
+
+
+if __name__ == "__main__":
+    main()
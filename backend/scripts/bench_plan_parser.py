@@ -0,0 +1,111 @@
+"""
+Benchmark del parser incremental de planes.
+
+Genera tablas sintéticas de 30 días, las corta en fragmentos del tamaño de un
+token y compara el parseo del texto completo con MealPlanStreamParser /
+TrainingPlanStreamParser. Además estima el tiempo hasta el primer día emitido
+para una velocidad de generación dada, frente a esperar la respuesta completa.
+
+    python -m scripts.bench_plan_parser [--dias 30] [--iteraciones 200] [--tokens-por-segundo 80]
+"""
+from datetime import date, timedelta
+
+from app.utils.plan_parser import (
+    MealPlanStreamParser,
+    TrainingPlanStreamParser,
+    parse_meal_plan_table,
+    parse_training_plan_table,
+)
+from scripts.bench_utils import crear_parser, cronometro, percentil
+
+COMIDAS = ["Desayuno", "Snack 1", "Almuerzo", "Snack 2", "Cena"]
+# Caracteres promedio por token en las tablas generadas
+CARACTERES_POR_TOKEN = 4
+
+
+def tabla_comidas(dias: int) -> str:
+    # parse_meal_plan_table ubica las columnas por posición, así que la tabla va alineada
+    anchos = [10, 8, 24, 9, 6, 13, 12]
+    encabezado = ["Fecha", "Comida", "Plato", "Proteínas", "Grasas", "Carbohidratos", "Kcal Totales"]
+
+    def fila(valores):
+        return "| " + " | ".join(str(v).ljust(ancho) for v, ancho in zip(valores, anchos)) + " |"
+
+    inicio = date.today()
+    lineas = [fila(encabezado), fila(["-" * ancho for ancho in anchos]).replace(" ", "-")]
+    for i in range(dias):
+        fecha = (inicio + timedelta(days=i)).strftime('%d-%m-%Y')
+        for comida in COMIDAS:
+            lineas.append(fila([fecha, comida, f"Plato de {comida.lower()} {i}", 25, 12, 40, 380]))
+    return "\n".join(lineas)
+
+
+def tabla_entrenamiento(dias: int) -> str:
+    inicio = date.today()
+    lineas = [
+        "| Fecha | Tipo de día | Ejercicio | Series | Repeticiones | Descanso | Notas |",
+        "|-------|-------------|-----------|---------|--------------|----------|-------|",
+    ]
+    for i in range(dias):
+        fecha = (inicio + timedelta(days=i)).strftime('%d-%m-%Y')
+        for j in range(5):
+            lineas.append(f"| {fecha} | Fuerza | Ejercicio {j} | 4 | 10 | 60 seg | Controlar la técnica |")
+    return "\n".join(lineas)
+
+
+def fragmentar(texto: str):
+    return [texto[i:i + CARACTERES_POR_TOKEN] for i in range(0, len(texto), CARACTERES_POR_TOKEN)]
+
+
+def parsear_stream(clase, fragmentos):
+    """Retorna (días, índice del fragmento que completó el primer día)."""
+    parser = clase()
+    dias = []
+    primer_dia = None
+    for i, fragmento in enumerate(fragmentos):
+        dias.extend(parser.feed(fragmento))
+        if primer_dia is None and dias:
+            primer_dia = i + 1
+    dias.extend(parser.close())
+    return dias, primer_dia or len(fragmentos)
+
+
+def medir_tiempos(funcion, iteraciones: int):
+    tiempos = []
+    for _ in range(iteraciones):
+        with cronometro() as r:
+            funcion()
+        tiempos.append(r["ms"])
+    return tiempos
+
+
+def reportar_escenario(nombre, texto, parse_completo, clase, args):
+    fragmentos = fragmentar(texto)
+    dias, primer_dia = parsear_stream(clase, fragmentos)
+    assert dias == parse_completo(texto)
+
+    completo = medir_tiempos(lambda: parse_completo(texto), args.iteraciones)
+    stream = medir_tiempos(lambda: parsear_stream(clase, fragmentos), args.iteraciones)
+
+    print(f"{nombre}: {len(dias)} días, {len(fragmentos)} fragmentos")
+    print(f"  parseo texto completo      p50={percentil(completo, 50):8.3f} ms  p99={percentil(completo, 99):8.3f} ms")
+    print(f"  parseo por fragmentos      p50={percentil(stream, 50):8.3f} ms  p99={percentil(stream, 99):8.3f} ms")
+    print(
+        f"  primer día disponible a {args.tokens_por_segundo} tok/s: "
+        f"{primer_dia / args.tokens_por_segundo:6.2f} s (stream) vs "
+        f"{len(fragmentos) / args.tokens_por_segundo:6.2f} s (respuesta completa)"
+    )
+
+
+def main():
+    parser = crear_parser(__doc__)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--tokens-por-segundo", type=float, default=80)
+    args = parser.parse_args()
+
+    reportar_escenario("comidas", tabla_comidas(args.dias), parse_meal_plan_table, MealPlanStreamParser, args)
+    reportar_escenario("entrenamiento", tabla_entrenamiento(args.dias), parse_training_plan_table, TrainingPlanStreamParser, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark de persistencia de planes generados.
+
+Compara el guardado anterior (db.add + db.flush por día) con la inserción
+multi-fila de insertar_plan_comidas / insertar_plan_entrenamiento, reportando
+sentencias por plan y tiempo de pared.
+
+    python -m scripts.bench_plan_persist [--url URL] [--dias 30] [--iteraciones 50]
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.models import models_auto as models
+from app.crud.plan_dieta_usuario import insertar_plan_comidas
+from app.crud.plan_rutina_usuario import insertar_plan_entrenamiento
+from scripts.bench_utils import crear_parser, crear_engine, crear_tablas, medir, reportar
+
+TABLAS = [
+    models.PlanDietaUsuario.__table__,
+    models.PlanComidasDiario.__table__,
+    models.DetallePlanComidas.__table__,
+    models.PlanRutinaUsuario.__table__,
+    models.PlanEntrenamientoDiario.__table__,
+    models.DetallePlanEntrenamiento.__table__,
+]
+
+
+def plan_comidas_sintetico(dias: int):
+    inicio = date.today()
+    return [
+        {
+            "fecha": inicio + timedelta(days=i),
+            "comidas": [
+                {
+                    "tipo_comida": comida,
+                    "plato": f"{comida} {i}",
+                    "proteinas": 25.0,
+                    "grasas": 12.0,
+                    "carbohidratos": 40.0,
+                    "calorias": 380.0
+                }
+                for comida in ["Desayuno", "Snack 1", "Almuerzo", "Snack 2", "Cena"]
+            ]
+        }
+        for i in range(dias)
+    ]
+
+
+def plan_entrenamiento_sintetico(dias: int):
+    inicio = date.today()
+    return [
+        {
+            "fecha": (inicio + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "tipo_dia": "Fuerza",
+            "ejercicios": [
+                {"nombre": f"Ejercicio {j}", "series": 3, "repeticiones": 10, "descanso": "60 seg", "notas": ""}
+                for j in range(5)
+            ]
+        }
+        for i in range(dias)
+    ]
+
+
+def guardar_comidas_por_dia(db, id_usuario, plan_datos):
+    """Guardado anterior: un flush por día para obtener su id."""
+    plan_dieta = models.PlanDietaUsuario(id_usuario=id_usuario, id_estado_plan=1)
+    db.add(plan_dieta)
+    db.flush()
+    for dia in plan_datos:
+        plan_diario = models.PlanComidasDiario(id_plan_dieta=plan_dieta.id, fecha=dia['fecha'])
+        db.add(plan_diario)
+        db.flush()
+        for comida in dia['comidas']:
+            db.add(models.DetallePlanComidas(id_plan_diario=plan_diario.id, **comida))
+
+
+def guardar_entrenamiento_por_dia(db, id_usuario, plan_days):
+    """Guardado anterior: un flush por día para obtener su id."""
+    plan_rutina = models.PlanRutinaUsuario(id_usuario=id_usuario, id_estado_plan=1)
+    db.add(plan_rutina)
+    db.flush()
+    for day in plan_days:
+        plan_dia = models.PlanEntrenamientoDiario(
+            id_plan_rutina=plan_rutina.id,
+            fecha=datetime.strptime(day['fecha'], '%Y-%m-%d'),
+            tipo_dia=day['tipo_dia']
+        )
+        db.add(plan_dia)
+        db.flush()
+        for ejercicio in day['ejercicios']:
+            db.add(models.DetallePlanEntrenamiento(
+                id_plan_diario=plan_dia.id,
+                ejercicio=ejercicio['nombre'],
+                series=ejercicio['series'],
+                repeticiones=ejercicio['repeticiones']
+            ))
+
+
+def main():
+    parser = crear_parser(__doc__)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.set_defaults(iteraciones=50)
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url)
+    crear_tablas(engine, TABLAS)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    comidas = plan_comidas_sintetico(args.dias)
+    entrenamiento = plan_entrenamiento_sintetico(args.dias)
+
+    def ejecutar(guardar, plan):
+        def funcion():
+            with Session() as db:
+                guardar(db, 1, plan)
+                db.commit()
+        return funcion
+
+    print(f"Plan sintético: {args.dias} días x 5 filas de detalle")
+    reportar("comidas: flush por día", *medir(engine, ejecutar(guardar_comidas_por_dia, comidas), args.iteraciones))
+    reportar("comidas: multi-fila", *medir(engine, ejecutar(insertar_plan_comidas, comidas), args.iteraciones))
+    reportar("entrenamiento: flush por día", *medir(engine, ejecutar(guardar_entrenamiento_por_dia, entrenamiento), args.iteraciones))
+    reportar("entrenamiento: multi-fila", *medir(engine, ejecutar(insertar_plan_entrenamiento, entrenamiento), args.iteraciones))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmark de serialización de GET /api/meal-plan.
+
+Arma en memoria un plan de 30 días con 5 comidas por día (150 comidas, con
+los macros como Decimal, igual que los devuelve MySQL) y mide el costo de
+convertirlo en el cuerpo de la respuesta:
+
+- jsonable_encoder + JSONResponse: el camino por defecto de FastAPI.
+- jsonable_encoder + RespuestaJSONRapida: una ruta que devuelve un dict con
+  la respuesta por defecto de la app.
+- RespuestaJSONRapida directa: la ruta devuelve la respuesta ya construida.
+
+    python -m scripts.bench_respuestas_json [--dias 30] [--iteraciones 2000]
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils.respuestas import RespuestaJSONRapida
+from scripts.bench_meal_plan import COMIDAS
+from scripts.bench_utils import percentil
+
+
+def armar_payload(dias: int):
+    inicio = date.today()
+    return [
+        {
+            "fecha": (inicio + timedelta(days=i)).isoformat(),
+            "comidas": [
+                {
+                    "tipo_comida": comida,
+                    "plato": f"{comida} del día {i + 1}: pechuga de pollo a la plancha con arroz integral y ensalada",
+                    "proteinas": Decimal("25.50"),
+                    "grasas": Decimal("12.25"),
+                    "carbohidratos": Decimal("40.00"),
+                    "calorias": Decimal("380.75")
+                }
+                for comida in COMIDAS
+            ]
+        }
+        for i in range(dias)
+    ]
+
+
+def medir(funcion, iteraciones: int):
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--iteraciones", type=int, default=2000)
+    args = parser.parse_args()
+
+    payload = armar_payload(args.dias)
+    escenarios = [
+        ("jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(payload))),
+        ("jsonable_encoder + orjson", lambda: RespuestaJSONRapida(jsonable_encoder(payload))),
+        ("orjson directo", lambda: RespuestaJSONRapida(payload)),
+    ]
+
+    # Los tres caminos deben producir un cuerpo del mismo tamaño
+    cuerpos = {len(funcion().body) for _, funcion in escenarios}
+    cuerpo = RespuestaJSONRapida(payload).body
+    print(f"{args.dias} días, {args.dias * len(COMIDAS)} comidas, {len(cuerpo)} bytes "
+          f"({'mismo tamaño' if len(cuerpos) == 1 else 'tamaños distintos: ' + str(sorted(cuerpos))})")
+
+    for nombre, funcion in escenarios:
+        tiempos = medir(funcion, args.iteraciones)
+        print(
+            f"{nombre:<28} p50={percentil(tiempos, 50):8.3f} ms  "
+            f"p99={percentil(tiempos, 99):8.3f} ms  "
+            f"media={statistics.mean(tiempos):8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
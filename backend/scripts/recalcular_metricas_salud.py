@@ -0,0 +1,50 @@
+"""
+Recalcula Metricas_Salud_Perfil para todos los perfiles.
+
+Se ejecuta tras cambiar alguna fórmula de app/utils/health_calculations (y
+de su versión vectorizada health_calculations_lote), o para cargar las
+métricas de los perfiles existentes de una vez en lugar de en su primera lectura:
+
+    python -m scripts.recalcular_metricas_salud [--tamano-bloque 5000] [--desde-id 0]
+
+Los perfiles se leen por bloques de ids consecutivos, las métricas de cada
+bloque se calculan con NumPy y se guardan con INSERT multi-fila, con un
+commit por bloque. Si se interrumpe, --desde-id retoma desde el último id
+informado.
+"""
+import argparse
+import time
+
+from app.crud.metricas_salud import armar_metricas_lote, entradas_metricas_bloque_stmt, guardar_metricas_lote
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamano-bloque", type=int, default=5000, help="Perfiles leídos y guardados por transacción")
+    parser.add_argument("--desde-id", type=int, default=0, help="Procesar solo los perfiles con id mayor a este")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    ultimo_id = args.desde_id
+    guardados = 0
+    sin_datos = 0
+    with SessionLocal() as db:
+        while True:
+            entradas = db.execute(entradas_metricas_bloque_stmt(ultimo_id, args.tamano_bloque)).all()
+            if not entradas:
+                break
+            filas, ids_sin_datos = armar_metricas_lote(entradas)
+            guardar_metricas_lote(db, filas, ids_sin_datos)
+            db.commit()
+
+            ultimo_id = entradas[-1].id
+            guardados += len(filas)
+            sin_datos += len(ids_sin_datos)
+            print(f"hasta el perfil {ultimo_id}: {guardados} perfiles con métricas, {sin_datos} sin datos suficientes")
+
+    print(f"{guardados} perfiles recalculados en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Reconstruye Seguimiento_Metrica_Resumen a partir de seguimiento_metrica.
+
+Se ejecuta una vez tras crear la tabla para cargar el historial existente, y
+cuando haya que reparar el resumen (p. ej. tras cargas manuales en la base):
+
+    python -m scripts.reconstruir_resumen_metricas [--usuario 12] [--tipo-metrica "Peso corporal"]
+
+Sin filtros se reconstruye todo el resumen en una sola transacción.
+"""
+import argparse
+import time
+
+from app.crud.seguimiento_metrica_resumen import recalcular_resumen
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuario", type=int, default=None, help="Solo el resumen de este id de usuario")
+    parser.add_argument("--tipo-metrica", default=None, help="Solo el resumen de este tipo de métrica")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with SessionLocal() as db:
+        filas = recalcular_resumen(db, id_usuario=args.usuario, tipo_metrica=args.tipo_metrica)
+        db.commit()
+    print(f"{filas} periodos reconstruidos en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
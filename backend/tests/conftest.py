@@ -0,0 +1,42 @@
+"""
+Utilidades compartidas por las pruebas. Se ejecutan desde el directorio backend
+con `python -m pytest` sobre SQLite, sin MySQL ni credenciales.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.mysql import LONGTEXT, MEDIUMTEXT, SET, TINYINT, YEAR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from scripts.bench_utils import crear_tablas
+
+# Tipos propios de MySQL de models_auto, con su equivalente en SQLite
+for tipo, equivalente in [(TINYINT, "INTEGER"), (YEAR, "INTEGER"), (SET, "TEXT"), (LONGTEXT, "TEXT"), (MEDIUMTEXT, "TEXT")]:
+    compiles(tipo, "sqlite")(lambda elemento, compilador, _equivalente=equivalente, **kw: _equivalente)
+
+
+@pytest.fixture
+def engine_sqlite(tmp_path):
+    """
+    Base SQLite en un archivo temporal con una sola conexión en el pool: una
+    sesión que queda abierta hace fallar a la siguiente tras pool_timeout.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pruebas.sqlite3'}",
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=2,
+    )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def crear_sesiones(engine_sqlite):
+    """Crea las tablas indicadas y retorna un sessionmaker sobre engine_sqlite."""
+    def crear(*modelos):
+        crear_tablas(engine_sqlite, [modelo.__table__ for modelo in modelos])
+        return sessionmaker(bind=engine_sqlite)
+    return crear
@@ -0,0 +1,53 @@
+"""
+get_current_user confirma el usuario en la base; la caché por worker solo lo
+reutiliza durante AUTH_CACHE_TTL_SECONDS.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import auth
+from app.models.base import User
+
+
+@pytest.fixture
+def sesiones_async(crear_sesiones, engine_sqlite):
+    crear_sesiones(User)
+    with engine_sqlite.begin() as conn:
+        conn.execute(text("INSERT INTO usuario (id, correo, nombre) VALUES (1, 'ana@example.com', 'Ana')"))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{engine_sqlite.url.database}")
+    yield async_sessionmaker(engine)
+    asyncio.run(engine.dispose())
+
+
+def autenticar(sesiones_async, token: str):
+    async def resolver():
+        async with sesiones_async() as db:
+            return await auth.get_current_user(token, db)
+    return asyncio.run(resolver())
+
+
+def test_usuario_eliminado_fuera_del_orm_deja_de_autenticar(sesiones_async, engine_sqlite):
+    token = auth.create_access_token({"sub": "ana@example.com"})
+    assert autenticar(sesiones_async, token) == auth.UsuarioAutenticado(id=1, email="ana@example.com", nombre="Ana")
+
+    # Borrado por SQL directo (u otro worker): no dispara la invalidación de este proceso
+    with engine_sqlite.begin() as conn:
+        conn.execute(text("DELETE FROM usuario WHERE id = 1"))
+    assert autenticar(sesiones_async, token).id == 1
+
+    # Al vencer la entrada de la caché se vuelve a consultar la base
+    auth._usuarios_cache.invalidar("ana@example.com")
+    with pytest.raises(HTTPException) as error:
+        autenticar(sesiones_async, token)
+    assert error.value.status_code == 401
+
+
+def test_los_claims_del_token_no_reemplazan_a_la_base(sesiones_async):
+    token = auth.create_access_token({"sub": "nadie@example.com", "uid": 7, "nombre": "Nadie"})
+    with pytest.raises(HTTPException) as error:
+        autenticar(sesiones_async, token)
+    assert error.value.status_code == 401
@@ -0,0 +1,150 @@
+"""
+Mientras se genera un plan, el proceso debe seguir atendiendo otras peticiones,
+también las que usan la base: la generación no retiene una conexión del pool.
+Un servidor /v1/chat/completions local retiene la respuesta hasta que la prueba
+lo libera.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.auth import get_current_user
+from app.database import get_db
+from app.models import models_auto as models
+from app.routes import meal
+from app.services import llm, plan_generation
+
+TEXTO_PLAN = "Plan de prueba"
+
+
+class ManejadorLento(BaseHTTPRequestHandler):
+    """/v1/chat/completions que responde solo cuando la prueba lo libera."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.recibida.set()
+        self.server.liberar.wait(10)
+        cuerpo = json.dumps({
+            "id": "chatcmpl-prueba",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "prueba",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": TEXTO_PLAN},
+                "finish_reason": "stop",
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_lento(monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ManejadorLento)
+    servidor.recibida = threading.Event()
+    servidor.liberar = threading.Event()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    monkeypatch.setenv("OPENAI_API_KEY", "prueba")
+    monkeypatch.setattr(llm, "OPENAI_BASE_URL", f"http://127.0.0.1:{servidor.server_port}/v1")
+    monkeypatch.setattr(llm, "_cliente", None)
+    monkeypatch.setattr(llm, "_semaforo", asyncio.Semaphore(llm.OPENAI_MAX_CONCURRENCY))
+    yield servidor
+
+    servidor.liberar.set()
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def app_prueba(crear_sesiones, monkeypatch):
+    sesiones = crear_sesiones(
+        models.PerfilUsuario,
+        models.PreferenciasAlimentarias,
+        models.AlimentosEvitados,
+        models.PlanDietaUsuario,
+        models.PlanComidasDiario,
+        models.DetallePlanComidas,
+    )
+    with sesiones() as db:
+        db.add(models.PerfilUsuario(id_usuario=1, objetivo_principal="perder peso"))
+        db.commit()
+    monkeypatch.setattr(plan_generation, "SessionLocal", sesiones)
+
+    def get_db_prueba():
+        with sesiones() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(meal.router, prefix="/api")
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/perfiles")
+    def contar_perfiles(db: Session = Depends(get_db)):
+        return {"perfiles": db.execute(select(func.count(models.PerfilUsuario.id))).scalar()}
+
+    app.dependency_overrides[get_db] = get_db_prueba
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, email="prueba@example.com")
+    return app, sesiones
+
+
+def pedir_durante_la_generacion(app, servidor, ruta: str):
+    """
+    Pide `ruta` mientras el servidor retiene la generación del plan de comidas.
+    Retorna (respuesta de `ruta`, respuesta de la generación).
+    """
+    async def escenario():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://prueba") as cliente:
+            generacion = asyncio.create_task(
+                cliente.post("/api/generate-meal-plan", headers={"Authorization": "Bearer prueba"})
+            )
+            assert await asyncio.to_thread(servidor.recibida.wait, 5)
+
+            respuesta = await asyncio.wait_for(cliente.get(ruta), timeout=5)
+            assert not generacion.done()
+
+            servidor.liberar.set()
+            return respuesta, await asyncio.wait_for(generacion, timeout=5)
+
+    return asyncio.run(escenario())
+
+
+def test_otras_peticiones_se_atienden_durante_la_generacion(servidor_lento, app_prueba):
+    app, sesiones = app_prueba
+    respuesta, generacion = pedir_durante_la_generacion(app, servidor_lento, "/api/ping")
+
+    assert respuesta.status_code == 200
+    assert generacion.status_code == 200
+    assert generacion.json()["meal_plan"] == TEXTO_PLAN
+    with sesiones() as db:
+        assert db.execute(select(func.count(models.PlanDietaUsuario.id))).scalar() == 1
+
+
+def test_la_generacion_no_retiene_la_conexion(servidor_lento, app_prueba):
+    # Con un pool de una conexión esto solo responde si la generación no la retiene
+    app, _ = app_prueba
+    respuesta, generacion = pedir_durante_la_generacion(app, servidor_lento, "/api/perfiles")
+
+    assert respuesta.status_code == 200
+    assert respuesta.json() == {"perfiles": 1}
+    assert generacion.status_code == 200
@@ -0,0 +1,38 @@
+"""
+/api/metrics solo responde con el token configurado en METRICS_TOKEN.
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.routes import metrics
+
+
+def pedir_metricas(cabeceras=None) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(metrics.router, prefix="/api")
+
+    async def pedir():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://test") as cliente:
+            return await cliente.get("/api/metrics", headers=cabeceras or {})
+    return asyncio.run(pedir())
+
+
+def test_sin_token_configurado_no_se_expone(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert pedir_metricas().status_code == 404
+    assert pedir_metricas({"X-Metrics-Token": ""}).status_code == 404
+
+
+def test_requiere_el_token_configurado(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secreto")
+    monkeypatch.setattr(metrics, "metricas_pool", lambda: {})
+    monkeypatch.setattr(metrics, "metricas_pool_async", lambda: {})
+    assert pedir_metricas().status_code == 401
+    assert pedir_metricas({"X-Metrics-Token": "otro"}).status_code == 401
+
+    respuesta = pedir_metricas({"X-Metrics-Token": "secreto"})
+    assert respuesta.status_code == 200
+    assert set(respuesta.json()) == {"db_pool", "db_pool_async", "plan_cache", "caches"}
@@ -0,0 +1,203 @@
+"""
+Número de sentencias de crear_medicion y eliminar_medicion, incluidas las del
+resumen de métricas, medido con ContadorConsultas sobre SQLite, y la serie
+agregada que se lee del resumen.
+"""
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.compiler import compiles
+
+from app.crud import metricas_salud, seguimiento_metrica_resumen
+from app.crud.seguimiento_metrica import crear_medicion, eliminar_medicion
+from app.crud.seguimiento_metrica_resumen import UltimoValor, recalcular_resumen, serie_stmt
+from app.models import models_auto as models
+from scripts.bench_utils import ContadorConsultas
+
+
+class InsertarOActualizar(sqlite.Insert):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE de MySQL traducido a ON CONFLICT de
+    SQLite sobre la clave primaria. Como en MySQL las asignaciones se evalúan
+    con los valores anteriores de la fila salvo las que ya se aplicaron, y el
+    resumen solo lee ultima_fecha antes de asignarla, el resultado es el mismo.
+    """
+    inherit_cache = True
+
+    @property
+    def inserted(self):
+        return self.excluded
+
+    def on_duplicate_key_update(self, *args, **kwargs):
+        return self.on_conflict_do_update(
+            index_elements=list(self.table.primary_key.columns),
+            set_=dict(args[0]) if args else kwargs
+        )
+
+
+class AgregadoUltimoValor:
+    """GROUP_CONCAT(valor ORDER BY ... DESC), que SQLite < 3.44 no admite."""
+
+    def __init__(self):
+        self.ultimo = None
+
+    def step(self, valor, *orden):
+        if self.ultimo is None or orden > self.ultimo[0]:
+            self.ultimo = (orden, valor)
+
+    def finalize(self):
+        return None if self.ultimo is None else str(self.ultimo[1])
+
+
+@compiles(UltimoValor, "sqlite")
+def _ultimo_valor_sqlite(element, compiler, **kw):
+    return f"ULTIMO_VALOR({compiler.process(element.clauses, **kw)})"
+
+
+def _restar_dias(fecha, dias):
+    return (date.fromisoformat(fecha) - timedelta(days=dias)).isoformat()
+
+
+@pytest.fixture
+def sesiones(crear_sesiones, engine_sqlite, monkeypatch):
+    @event.listens_for(engine_sqlite, "connect")
+    def funciones_mysql(conexion, _):
+        conexion.create_function("TO_DAYS", 1, lambda fecha: date.fromisoformat(fecha).toordinal() + 365)
+        conexion.create_function("GREATEST", 2, max)
+        conexion.create_function("LEAST", 2, min)
+        conexion.create_function("SUBDATE", 2, _restar_dias)
+        conexion.create_function("WEEKDAY", 1, lambda fecha: date.fromisoformat(fecha).weekday())
+        conexion.create_function("DAYOFMONTH", 1, lambda fecha: date.fromisoformat(fecha).day)
+        conexion.create_aggregate("ULTIMO_VALOR", -1, AgregadoUltimoValor)
+
+    monkeypatch.setattr(seguimiento_metrica_resumen, "insert", InsertarOActualizar)
+    monkeypatch.setattr(metricas_salud, "insert", InsertarOActualizar)
+    return crear_sesiones(
+        models.SeguimientoMetrica,
+        models.SeguimientoMetricaResumen,
+        models.PerfilUsuario,
+        models.MetricasSaludPerfil,
+    )
+
+
+def medicion(tipo_metrica="Frecuencia cardíaca", fecha=date(2026, 3, 4), valor=70.125):
+    return {"tipo_metrica": tipo_metrica, "fecha": fecha, "valor_principal": valor, "categoria": None, "detalles": None}
+
+
+def resumen(db):
+    return db.execute(
+        select(models.SeguimientoMetricaResumen.granularidad, models.SeguimientoMetricaResumen.mediciones,
+               models.SeguimientoMetricaResumen.suma)
+        .order_by(models.SeguimientoMetricaResumen.granularidad)
+    ).all()
+
+
+def test_crear_medicion_inserta_y_acumula_en_dos_sentencias(sesiones, engine_sqlite):
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        nueva = crear_medicion(db, 1, medicion())
+    # INSERT de la medición y un INSERT ... ON CONFLICT multi-fila para el día y la semana
+    assert contador.total == 2
+    assert nueva["valor_principal"] == Decimal("70.13")
+    assert nueva["created_at"] == nueva["updated_at"]
+
+    with sesiones() as db:
+        guardada = db.get(models.SeguimientoMetrica, nueva["id"])
+        assert guardada.valor_principal == Decimal("70.13")
+        assert guardada.created_at == nueva["created_at"]
+        assert resumen(db) == [("dia", 1, Decimal("70.13")), ("semana", 1, Decimal("70.13"))]
+
+
+def test_crear_peso_corporal_recalcula_las_metricas_de_salud(sesiones, engine_sqlite):
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        crear_medicion(db, 1, medicion("Peso corporal", valor=70.5))
+    # Además, la lectura de entradas de las métricas y su DELETE (el usuario no tiene perfil)
+    assert contador.total == 4
+
+
+@pytest.mark.parametrize("con_cuerpo, delete_returning, sentencias", [
+    (True, True, 4),    # DELETE filtrado por id, tipo y fecha
+    (False, True, 4),   # DELETE ... RETURNING
+    (False, False, 5),  # SELECT previo y DELETE (MySQL)
+])
+def test_eliminar_medicion_recalcula_la_semana(sesiones, engine_sqlite, monkeypatch, con_cuerpo, delete_returning, sentencias):
+    with sesiones() as db:
+        primera = crear_medicion(db, 1, medicion())
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 6), valor=72))
+    monkeypatch.setattr(engine_sqlite.dialect, "delete_returning", delete_returning)
+
+    filtro = (primera["tipo_metrica"], primera["fecha"]) if con_cuerpo else (None, None)
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        assert eliminar_medicion(db, 1, primera["id"], *filtro)
+    # Más el DELETE del resumen de la semana y un INSERT ... SELECT por granularidad
+    assert contador.total == sentencias
+
+    with sesiones() as db:
+        assert resumen(db) == [("dia", 1, Decimal("72")), ("semana", 1, Decimal("72"))]
+
+
+def test_eliminar_medicion_inexistente_no_toca_el_resumen(sesiones, engine_sqlite):
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        assert not eliminar_medicion(db, 1, 99)
+    assert contador.total == 1
+
+
+def lecturas_de_mediciones(sentencias):
+    """
+    SELECT de filas de seguimiento_metrica. No cuentan los INSERT ... SELECT
+    del resumen ni la subconsulta del último peso de las métricas de salud.
+    """
+    return [s for s in sentencias if re.match(r"SELECT [^()]*\sFROM seguimiento_metrica\b", s.lstrip())]
+
+
+@pytest.mark.parametrize("tipo_metrica", ["Frecuencia cardíaca", "Peso corporal"])
+def test_crear_medicion_no_relee_la_fila(sesiones, engine_sqlite, tipo_metrica):
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        crear_medicion(db, 1, medicion(tipo_metrica))
+    assert lecturas_de_mediciones(contador.sentencias) == []
+
+
+@pytest.mark.parametrize("con_cuerpo", [True, False])
+def test_eliminar_medicion_no_lee_la_fila_antes_del_delete(sesiones, engine_sqlite, con_cuerpo):
+    with sesiones() as db:
+        nueva = crear_medicion(db, 1, medicion())
+
+    filtro = (nueva["tipo_metrica"], nueva["fecha"]) if con_cuerpo else (None, None)
+    with sesiones() as db, ContadorConsultas(engine_sqlite) as contador:
+        assert eliminar_medicion(db, 1, nueva["id"], *filtro)
+    # Con el cuerpo o con DELETE ... RETURNING; en MySQL sin cuerpo queda el SELECT previo
+    assert lecturas_de_mediciones(contador.sentencias) == []
+
+
+def test_recalcular_resumen_reproduce_lo_acumulado(sesiones):
+    with sesiones() as db:
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 6), valor=72))
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 4), valor=70))
+        # Misma fecha: el último valor es el de la medición insertada después
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 6), valor=71))
+        crear_medicion(db, 2, medicion("Peso corporal", fecha=date(2026, 3, 10), valor=80))
+        acumulado = db.execute(select(models.SeguimientoMetricaResumen.__table__)).all()
+
+        assert recalcular_resumen(db) == len(acumulado)
+        recalculado = db.execute(select(models.SeguimientoMetricaResumen.__table__)).all()
+    assert sorted(recalculado) == sorted(acumulado)
+
+
+@pytest.mark.parametrize("intervalo, filtro, esperado", [
+    # Semanas sin rango: resumen semanal; el último valor es el del día más reciente
+    ("semana", {}, [(date(2026, 3, 2), 2, Decimal("72")), (date(2026, 3, 9), 1, Decimal("75"))]),
+    ("semana", {"fecha_fin": date(2026, 3, 8)}, [(date(2026, 3, 2), 2, Decimal("72"))]),
+    ("mes", {}, [(date(2026, 3, 1), 3, Decimal("75"))]),
+])
+def test_serie_agrupa_el_resumen_por_intervalo(sesiones, intervalo, filtro, esperado):
+    with sesiones() as db:
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 6), valor=72))
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 4), valor=70))
+        crear_medicion(db, 1, medicion(fecha=date(2026, 3, 10), valor=75))
+        crear_medicion(db, 2, medicion(fecha=date(2026, 3, 10), valor=90))
+
+        filas = db.execute(serie_stmt(1, "Frecuencia cardíaca", intervalo, **filtro)).all()
+    assert [(fila.periodo, fila.mediciones, Decimal(fila.ultimo)) for fila in filas] == esperado